@@ -0,0 +1,5 @@
+"""HTTP and data caching helpers for Moo API"""
+
+from .etag import make_etag, etag_matches, touch, not_modified
+
+__all__ = ["make_etag", "etag_matches", "touch", "not_modified"]
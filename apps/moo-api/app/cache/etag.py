@@ -0,0 +1,67 @@
+"""
+ETag / Conditional GET Helpers
+Builds strong validators from row fingerprints and answers If-None-Match
+"""
+
+from fastapi import Response
+from typing import Optional
+from datetime import datetime, timedelta
+import hashlib
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from fingerprint parts
+
+    Parts are typically ids, counts and updated_at timestamps. Datetimes are
+    serialized with microseconds so two writes in the same second still
+    produce different validators.
+    """
+    normalized = []
+    for part in parts:
+        if isinstance(part, datetime):
+            normalized.append(part.isoformat(timespec="microseconds"))
+        else:
+            normalized.append(repr(part))
+
+    digest = hashlib.sha1("|".join(normalized).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header value against an ETag
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so a
+    W/ prefix added by an intermediary proxy does not defeat revalidation.
+    """
+    if not if_none_match:
+        return False
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+
+    return any(
+        (tag[2:] if tag.startswith("W/") else tag) == etag
+        for tag in candidates
+    )
+
+def not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    """Build an empty 304 response carrying the current validators"""
+    headers = {"ETag": etag}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=304, headers=headers)
+
+def touch(row) -> datetime:
+    """
+    Bump a row's updated_at so it is strictly greater than before
+
+    datetime.utcnow() can repeat (coarse clocks) or go backwards (NTP), which
+    would leave a stale ETag valid after a write. Advancing by at least one
+    microsecond keeps the validators correct.
+    """
+    now = datetime.utcnow()
+    if row.updated_at is not None and now <= row.updated_at:
+        now = row.updated_at + timedelta(microseconds=1)
+    row.updated_at = now
+    return now
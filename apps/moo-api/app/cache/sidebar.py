@@ -0,0 +1,208 @@
+"""
+Sidebar Read-Through Cache
+Per-user cache for conversation and project listings with versioned keys
+
+Every cached entry is stored under (user, view, version, params). A write
+bumps the (user, view) version instead of deleting entries, so a reader that
+raced a writer can only ever store its result under a version nobody will
+ask for again. Stale entries age out of the LRU and every entry expires after
+SIDEBAR_CACHE_TTL seconds, which also bounds how long one worker can serve a
+listing another worker's write has invalidated (in-process backend only).
+"""
+
+from collections import OrderedDict
+from itertools import count
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+import json
+import os
+import time
+
+try:
+    import redis
+except ImportError:  # Optional - only needed for the shared backend
+    redis = None
+
+CONVERSATIONS = "conversations"
+PROJECTS = "projects"
+
+class MemoryBackend:
+    """Bounded in-process LRU backend (one per worker)"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, value)
+        self._entries: OrderedDict = OrderedDict()
+        # Versions live in their own bounded map; a forgotten version is
+        # replaced by a fresh global counter value so old keys never resurface
+        self._versions: OrderedDict = OrderedDict()
+        self._version_counter = count(1)
+        self._lock = Lock()
+        self.evictions = 0
+
+    def get_version(self, scope: str) -> int:
+        with self._lock:
+            version = self._versions.get(scope)
+            if version is None:
+                version = next(self._version_counter)
+                self._versions[scope] = version
+            self._versions.move_to_end(scope)
+            while len(self._versions) > self.max_entries * 4:
+                self._versions.popitem(last=False)
+            return version
+
+    def bump_version(self, scope: str) -> None:
+        with self._lock:
+            self._versions[scope] = next(self._version_counter)
+            self._versions.move_to_end(scope)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+class RedisBackend:
+    """Shared backend for multi-worker deployments"""
+
+    def __init__(self, url: str, ttl_seconds: int = 300):
+        if redis is None:
+            raise ValueError("SIDEBAR_CACHE_URL is set but the redis package is not installed")
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        # Versions outlive entries, so an expired counter restarting at 1
+        # cannot collide with a live entry
+        self.version_ttl_seconds = ttl_seconds * 12
+        self.evictions = 0
+
+    def get_version(self, scope: str) -> int:
+        key = f"moo:sidebar:version:{scope}"
+        version = self.client.get(key)
+        if version is None:
+            version = self.client.incr(key)
+        self.client.expire(key, self.version_ttl_seconds)
+        return int(version)
+
+    def bump_version(self, scope: str) -> None:
+        key = f"moo:sidebar:version:{scope}"
+        self.client.incr(key)
+        self.client.expire(key, self.version_ttl_seconds)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(f"moo:sidebar:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.setex(f"moo:sidebar:{key}", self.ttl_seconds, json.dumps(value))
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter("moo:sidebar:*"):
+            self.client.delete(key)
+
+    def size(self) -> int:
+        return -1  # Not tracked for the shared backend
+
+class SidebarCache:
+    """Read-through cache for per-user sidebar views"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "SidebarCache":
+        """Build the cache from SIDEBAR_CACHE_URL / SIDEBAR_CACHE_SIZE / SIDEBAR_CACHE_TTL"""
+        url = os.getenv("SIDEBAR_CACHE_URL")
+        ttl_seconds = int(os.getenv("SIDEBAR_CACHE_TTL", "300"))
+        if url:
+            backend = RedisBackend(url, ttl_seconds=ttl_seconds)
+        else:
+            backend = MemoryBackend(
+                max_entries=int(os.getenv("SIDEBAR_CACHE_SIZE", "1024")),
+                ttl_seconds=ttl_seconds
+            )
+        return cls(backend)
+
+    def get_or_load(self, user_id: str, view: str, params: tuple, loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for a user's view, loading it on a miss
+
+        The version is read before the loader runs, so a write that lands
+        while loading invalidates the result we are about to store.
+        """
+        scope = f"{user_id}:{view}"
+        version = self.backend.get_version(scope)
+        key = f"{scope}:v{version}:{json.dumps(params)}"
+
+        value = self.backend.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+
+        value = loader()
+        self.backend.set(key, value)
+        return value
+
+    def invalidate(self, user_id: Optional[str], *views: str) -> None:
+        """Invalidate the given views for a user (all views if none given)"""
+        if not user_id:
+            return  # Anonymous listings are never cached
+
+        for view in views or (CONVERSATIONS, PROJECTS):
+            self.backend.bump_version(f"{user_id}:{view}")
+            with self._lock:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters (benchmarks start each scenario cold)"""
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for the health endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+            "entries": self.backend.size()
+        }
+
+sidebar_cache = SidebarCache.from_env()
@@ -1,6 +1,7 @@
 """Database initialization and session management"""
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 from .models import Base
 import os
@@ -21,6 +22,38 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+
+def add_missing_columns():
+    """
+    Add nullable columns introduced after a table was created
+
+    create_all() never alters existing tables, so databases created before a
+    column was added to a model need it added here.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    # Several workers can run this at once; Postgres skips a column another
+    # worker just added, SQLite reports it as a duplicate
+    if_not_exists = "IF NOT EXISTS " if engine.dialect.name == "postgresql" else ""
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            statement = (
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {if_not_exists}{preparer.format_column(column)} {column_type}"
+            )
+            try:
+                with engine.begin() as connection:
+                    connection.execute(text(statement))
+            except OperationalError as error:
+                if "duplicate column" not in str(error.orig).lower():
+                    raise
 
 # Dependency for getting DB session
 def get_db():
@@ -0,0 +1,289 @@
+"""
+Hot/Cold Message Tiering
+Moves messages of idle conversations into compressed per-conversation archives
+
+    python -m app.database.archive --idle-days 90 [--vacuum] [--measure]
+
+Hot conversations keep their rows in `messages`. Conversations idle for more
+than --idle-days have all their messages packed into one zstd-compressed JSONL
+blob in `conversation_archives` and the rows deleted. Reads rehydrate the blob
+transparently; adding a message promotes the conversation back to the hot tier.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import argparse
+import json
+import os
+import time
+import zlib
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from . import SessionLocal, engine, init_db
+from .models import Conversation, ConversationArchive, Message
+from ..cache import touch
+
+try:
+    import zstandard
+except ImportError:  # Optional - falls back to zlib, recorded per archive
+    zstandard = None
+
+ZSTD_LEVEL = 10
+
+def compress(raw: bytes):
+    """Compress with zstd when available, returning (codec, payload)"""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, 9)
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+# Message columns carried through the cold tier besides id and created_at
+RECORD_FIELDS = ("role", "content", "model", "input_tokens", "output_tokens", "stop_reason", "latency_ms", "coalesced")
+
+def message_to_record(msg: Message) -> Dict:
+    record = {"id": msg.id, "created_at": msg.created_at.isoformat() if msg.created_at else None}
+    for name in RECORD_FIELDS:
+        value = getattr(msg, name)
+        if value is not None:
+            record[name] = value
+    return record
+
+def record_to_message(record: Dict) -> Dict:
+    """Turn an archived JSONL record back into the shape hot messages are read in"""
+    record = dict(record)
+    if record.get("created_at"):
+        record["created_at"] = datetime.fromisoformat(record["created_at"])
+    return record
+
+def read_archive(archive: ConversationArchive) -> List[Dict]:
+    """Decompress an archive into message dicts (id, role, content, created_at)"""
+    raw = decompress(archive.codec, archive.payload)
+    return [record_to_message(json.loads(line)) for line in raw.decode("utf-8").splitlines() if line]
+
+def load_messages(db: Session, conversation: Conversation) -> List[Dict]:
+    """
+    Get all messages of a conversation from whichever tier holds them
+
+    Returns dicts with id, role, content and created_at, oldest first.
+    """
+    if conversation.archive is not None:
+        return read_archive(conversation.archive)
+
+    messages = db.query(Message).filter(
+        Message.conversation_id == conversation.id
+    ).order_by(Message.created_at, Message.id).all()
+    return [
+        {"id": msg.id, "role": msg.role, "content": msg.content, "created_at": msg.created_at}
+        for msg in messages
+    ]
+
+def lock_for_append(db: Session, conversation_id: int) -> Optional[Conversation]:
+    """
+    Load a conversation that messages are about to be added to (caller commits)
+
+    The row is locked and its updated_at bumped and flushed before anything
+    else, so an archive run either committed first - and promote_conversation
+    then sees its archive - or waits and skips the now recently updated
+    conversation. The flushed UPDATE also takes SQLite's write lock, which
+    ignores FOR UPDATE. Returns None if the conversation does not exist.
+    """
+    conversation = db.query(Conversation).filter(
+        Conversation.id == conversation_id
+    ).with_for_update().first()
+
+    if conversation is not None:
+        touch(conversation)
+        db.flush()
+    return conversation
+
+def archive_conversation(db: Session, conversation: Conversation, cutoff: datetime) -> Optional[ConversationArchive]:
+    """
+    Pack a conversation's messages into an archive row (caller commits)
+
+    Returns None without archiving if the conversation was updated at or after
+    cutoff since it was selected.
+    """
+    # Lock the row and re-check idleness in one statement. A conditional no-op
+    # UPDATE does both on Postgres and SQLite alike; writers lock the same row
+    # first (lock_for_append), so none can add a message until we commit.
+    locked = db.query(Conversation).filter(
+        Conversation.id == conversation.id,
+        Conversation.updated_at < cutoff
+    ).update({Conversation.updated_at: Conversation.updated_at}, synchronize_session=False)
+    if not locked:
+        return None
+
+    messages = db.query(Message).filter(
+        Message.conversation_id == conversation.id
+    ).order_by(Message.created_at, Message.id).all()
+
+    raw = "".join(
+        json.dumps(message_to_record(msg), ensure_ascii=False) + "\n"
+        for msg in messages
+    ).encode("utf-8")
+    codec, payload = compress(raw)
+
+    archive = ConversationArchive(
+        conversation_id=conversation.id,
+        codec=codec,
+        message_count=len(messages),
+        last_message_id=max((msg.id for msg in messages), default=None),
+        raw_size=len(raw),
+        compressed_size=len(payload),
+        payload=payload
+    )
+    db.add(archive)
+
+    # Only the rows that were packed - never one we did not read
+    packed_ids = [msg.id for msg in messages]
+    if packed_ids:
+        db.query(Message).filter(
+            Message.conversation_id == conversation.id,
+            Message.id.in_(packed_ids)
+        ).delete(synchronize_session=False)
+    # The bulk delete bypasses the ORM, so drop any loaded collection
+    db.expire(conversation, ["messages"])
+
+    conversation.archive = archive
+    return archive
+
+def promote_conversation(db: Session, conversation: Conversation) -> int:
+    """
+    Move an archived conversation back to the hot tier (caller commits)
+
+    Messages are re-inserted with fresh ids - an archived id may have been
+    reused by SQLite since - but keep their original created_at order.
+    """
+    archive = conversation.archive
+    if archive is None:
+        return 0
+
+    records = read_archive(archive)
+    for record in records:
+        # Rollups already counted these messages, so they are not re-recorded
+        db.add(Message(
+            conversation_id=conversation.id,
+            created_at=record["created_at"],
+            **{name: record.get(name) for name in RECORD_FIELDS}
+        ))
+
+    conversation.archive = None  # delete-orphan removes the archive row
+    db.flush()
+    return len(records)
+
+def archive_idle_conversations(db: Session, idle_days: int, batch_size: int = 100) -> Dict:
+    """Archive every hot conversation not updated in idle_days, committing per batch"""
+    cutoff = datetime.utcnow() - timedelta(days=idle_days)
+    stats = {"conversations": 0, "messages": 0, "raw_bytes": 0, "compressed_bytes": 0}
+
+    while True:
+        batch = db.query(Conversation).outerjoin(ConversationArchive).filter(
+            Conversation.updated_at < cutoff,
+            ConversationArchive.id.is_(None)
+        ).order_by(Conversation.id).limit(batch_size).all()
+
+        if not batch:
+            break
+
+        for conversation in batch:
+            archive = archive_conversation(db, conversation, cutoff)
+            if archive is None:
+                continue  # Updated since the batch was selected
+            stats["conversations"] += 1
+            stats["messages"] += archive.message_count
+            stats["raw_bytes"] += archive.raw_size
+            stats["compressed_bytes"] += archive.compressed_size
+
+        db.commit()
+
+    return stats
+
+def database_size_bytes() -> int:
+    """On-disk size of the database (SQLite file pages, or Postgres relation sizes)"""
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            page_count = connection.execute(text("PRAGMA page_count")).scalar()
+            page_size = connection.execute(text("PRAGMA page_size")).scalar()
+            return page_count * page_size
+        if engine.dialect.name == "postgresql":
+            return connection.execute(text(
+                "SELECT pg_total_relation_size('messages') + pg_total_relation_size('conversation_archives')"
+            )).scalar()
+    return -1
+
+def vacuum() -> None:
+    """Return freed pages to the filesystem so size reductions are visible"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if engine.dialect.name == "sqlite":
+            connection.execute(text("VACUUM"))
+        elif engine.dialect.name == "postgresql":
+            connection.execute(text("VACUUM FULL messages"))
+
+def measure_reads(db: Session, sample: int = 50) -> Dict:
+    """Time load_messages() for sampled cold and hot conversations"""
+    def timed(conversations) -> Dict:
+        latencies = []
+        for conversation in conversations:
+            started = time.perf_counter()
+            load_messages(db, conversation)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        if not latencies:
+            return {"samples": 0}
+        return {
+            "samples": len(latencies),
+            "p50_ms": round(latencies[len(latencies) // 2], 2),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+        }
+
+    cold = db.query(Conversation).join(ConversationArchive).order_by(func.random()).limit(sample).all()
+    hot = db.query(Conversation).outerjoin(ConversationArchive).filter(
+        ConversationArchive.id.is_(None)
+    ).order_by(func.random()).limit(sample).all()
+
+    return {"cold": timed(cold), "hot": timed(hot)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive messages of idle conversations")
+    parser.add_argument("--idle-days", type=int, default=int(os.getenv("ARCHIVE_IDLE_DAYS", "90")))
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim disk space before measuring")
+    parser.add_argument("--measure", action="store_true", help="Report size reduction and cold-read latency")
+    args = parser.parse_args()
+
+    init_db()
+    size_before = database_size_bytes()
+
+    db = SessionLocal()
+    try:
+        stats = archive_idle_conversations(db, args.idle_days, args.batch_size)
+        print(f"Archived {stats['messages']} messages from {stats['conversations']} conversations "
+              f"({stats['raw_bytes']} -> {stats['compressed_bytes']} bytes)")
+
+        if args.vacuum:
+            vacuum()
+
+        if args.measure:
+            size_after = database_size_bytes()
+            print(json.dumps({
+                "database_bytes_before": size_before,
+                "database_bytes_after": size_after,
+                "reduction": round(1 - size_after / size_before, 4) if size_before > 0 else None,
+                "compression_ratio": round(stats["raw_bytes"] / stats["compressed_bytes"], 2) if stats["compressed_bytes"] else None,
+                "reads": measure_reads(db)
+            }, indent=2))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
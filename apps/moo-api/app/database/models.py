@@ -3,9 +3,9 @@ Database Models for Moo
 Handles conversations, projects, and file uploads
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum, Boolean, LargeBinary, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import enum
 
@@ -57,6 +57,7 @@ class Conversation(Base):
     project = relationship("Project", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     files = relationship("ConversationFile", back_populates="conversation", cascade="all, delete-orphan")
+    archive = relationship("ConversationArchive", back_populates="conversation", uselist=False, cascade="all, delete-orphan")
 
 class Message(Base):
     """Individual messages in a conversation"""
@@ -68,9 +69,62 @@ class Message(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    # Claude usage - set on assistant messages only
+    model = Column(String, nullable=True)
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    stop_reason = Column(String, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    # Reply shared from another caller's upstream call - its tokens are counted there
+    coalesced = Column(Boolean, nullable=True)
+
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
 
+class ConversationArchive(Base):
+    """Cold-tier storage: all messages of an idle conversation as one compressed JSONL blob"""
+    __tablename__ = "conversation_archives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False, unique=True)
+    codec = Column(String, nullable=False)  # "zstd" or "zlib"
+    message_count = Column(Integer, nullable=False)
+    last_message_id = Column(Integer, nullable=True)  # Highest id before archiving (keeps ETags stable)
+    raw_size = Column(Integer, nullable=False)  # Uncompressed JSONL bytes
+    compressed_size = Column(Integer, nullable=False)
+    payload = deferred(Column(LargeBinary, nullable=False))  # Only loaded on rehydrate
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    conversation = relationship("Conversation", back_populates="archive")
+
+class UsageRollupMixin:
+    """Usage totals for one time bucket, user, discipline, mode and model"""
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_start = Column(DateTime, nullable=False)
+    user_id = Column(String, nullable=False, default="", index=True)  # "" for anonymous
+    discipline = Column(String, nullable=False)
+    mode = Column(String, nullable=False)
+    model = Column(String, nullable=False)
+    requests = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms_total = Column(Integer, nullable=False, default=0)
+
+class UsageHourly(UsageRollupMixin, Base):
+    """Hourly usage rollup, updated incrementally as assistant messages are saved"""
+    __tablename__ = "usage_hourly"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "user_id", "discipline", "mode", "model", name="uq_usage_hourly_key"),
+    )
+
+class UsageDaily(UsageRollupMixin, Base):
+    """Daily usage rollup, updated incrementally as assistant messages are saved"""
+    __tablename__ = "usage_daily"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "user_id", "discipline", "mode", "model", name="uq_usage_daily_key"),
+    )
+
 class ConversationFile(Base):
     """Files uploaded to conversations"""
     __tablename__ = "conversation_files"
@@ -0,0 +1,78 @@
+"""
+Usage Rollups
+Incrementally maintained hourly and daily token / latency totals
+
+Every saved assistant message with usage adds one request to its hour and
+day bucket in the same transaction, via INSERT ... ON CONFLICT DO UPDATE.
+Reports read only these tables, so their cost does not grow with history.
+"""
+
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .models import Conversation, Message, UsageDaily, UsageHourly
+
+# Increment columns shared by both rollup tables
+COUNTERS = ("requests", "input_tokens", "output_tokens", "latency_ms_total")
+
+def hour_bucket(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+def day_bucket(at: datetime) -> datetime:
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def record_usage(db: Session, conversation: Conversation, message: Message) -> None:
+    """
+    Add an assistant message's usage to the rollups (caller commits)
+
+    Messages without a model (user messages, or assistant messages saved
+    without usage) are ignored. Coalesced replies are saved with zero tokens,
+    so each upstream call is counted once, for the caller that made it.
+    """
+    if message.role != "assistant" or not message.model:
+        return
+
+    at = message.created_at or datetime.utcnow()
+    key = {
+        "user_id": conversation.user_id or "",
+        "discipline": conversation.discipline.value,
+        "mode": conversation.mode.value,
+        "model": message.model
+    }
+    increments = {
+        "requests": 1,
+        "input_tokens": message.input_tokens or 0,
+        "output_tokens": message.output_tokens or 0,
+        "latency_ms_total": message.latency_ms or 0
+    }
+
+    _increment(db, UsageHourly, {"bucket_start": hour_bucket(at), **key}, increments)
+    _increment(db, UsageDaily, {"bucket_start": day_bucket(at), **key}, increments)
+
+def _increment(db: Session, rollup, key: Dict, increments: Dict) -> None:
+    """Upsert one rollup row, adding increments to its counters"""
+    table = rollup.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        statement = insert(table).values(**key, **increments)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={name: table.c[name] + statement.excluded[name] for name in increments}
+        )
+        db.execute(statement)
+        return
+
+    # Other databases: lock the row and update it in Python
+    row = db.query(rollup).filter_by(**key).with_for_update().first()
+    if row is None:
+        db.add(rollup(**key, **increments))
+    else:
+        for name, value in increments.items():
+            setattr(row, name, getattr(row, name) + value)
+    db.flush()
@@ -3,17 +3,24 @@ Moo Financial Intelligence Assistant - FastAPI Backend
 COW Group - Products Site Integration
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response, Depends, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional, List, Literal
 import os
+import json
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 
 from .services import ClaudeService
-from .database import init_db
-from .routers import conversations, projects
+from .services.chat_session import ChatSession, connection_limiter, CLOSE_POLICY_VIOLATION, CLOSE_TRY_AGAIN_LATER
+from .database import init_db, get_db, SessionLocal
+from .routers import conversations, projects, usage
+from .cache import make_etag, etag_matches, not_modified
+from .cache.sidebar import sidebar_cache
 
 # Load environment variables
 load_dotenv()
@@ -30,6 +37,7 @@ app = FastAPI(
 # Include routers
 app.include_router(conversations.router)
 app.include_router(projects.router)
+app.include_router(usage.router)
 
 # Initialize Claude service
 try:
@@ -39,23 +47,62 @@ except Exception as e:
     print(f"Warning: Claude service not initialized: {e}")
     claude_available = False
 
+ALLOWED_ORIGINS = [
+    "http://localhost:4201",  # products-site dev
+    "http://localhost:3000",
+    "https://products.cow.io",  # production (update with actual domain)
+]
+
 # CORS middleware for frontend integration
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:4201",  # products-site dev
-        "http://localhost:3000",
-        "https://products.cow.io",  # production (update with actual domain)
-    ],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # Lets the frontend revalidate with If-None-Match
 )
 
 # Type definitions
 Discipline = Literal["financial_accounting", "cost_accounting", "management_accounting", "financial_management", "all"]
 Mode = Literal["learning", "project"]
 
+# Static discipline metadata - built once, served with a fixed validator
+DISCIPLINES = {
+    "disciplines": [
+        {
+            "id": "financial_accounting",
+            "name": "Financial Accounting",
+            "color": "#3b82f6",
+            "icon": "FileText",
+            "concepts": 8
+        },
+        {
+            "id": "cost_accounting",
+            "name": "Cost Accounting",
+            "color": "#C77A58",
+            "icon": "Calculator",
+            "concepts": 8
+        },
+        {
+            "id": "management_accounting",
+            "name": "Management Accounting",
+            "color": "#00A5CF",
+            "icon": "BarChart3",
+            "concepts": 8
+        },
+        {
+            "id": "financial_management",
+            "name": "Financial Management",
+            "color": "#10b981",
+            "icon": "Briefcase",
+            "concepts": 6
+        }
+    ]
+}
+DISCIPLINES_ETAG = make_etag("disciplines", json.dumps(DISCIPLINES, sort_keys=True))
+DISCIPLINES_CACHE_CONTROL = "public, max-age=86400"
+
 class FileMetadata(BaseModel):
     name: str
     type: str
@@ -67,6 +114,8 @@ class ChatRequest(BaseModel):
     discipline: Discipline = "all"
     conversation_history: Optional[List[dict]] = []
     attachments: Optional[List[FileMetadata]] = []
+    # When set, the turn and its token usage are saved to this conversation
+    conversation_id: Optional[int] = None
 
 class ChatResponse(BaseModel):
     response: str
@@ -75,6 +124,12 @@ class ChatResponse(BaseModel):
     timestamp: datetime
     tools_used: Optional[List[str]] = []
     sources: Optional[List[str]] = []
+    model: Optional[str] = None
+    tokens_used: Optional[dict] = None
+    stop_reason: Optional[str] = None
+    latency_ms: Optional[int] = None
+    # True when the reply was shared from an identical in-flight request
+    coalesced: bool = False
 
 @app.get("/")
 async def root():
@@ -93,16 +148,43 @@ async def health_check():
         "status": "healthy",
         "claude_api": "available" if claude_available else "unavailable",
         "api_key_set": bool(os.getenv("ANTHROPIC_API_KEY")),
+        "sidebar_cache": sidebar_cache.stats(),
+        "claude_coalescing": claude_service.single_flight.stats() if claude_available else None,
+        "claude_models": claude_service.router.stats() if claude_available else None,
+        "websocket_connections": connection_limiter.stats(),
         "timestamp": datetime.now().isoformat()
     }
 
+def chat_turn_messages(message: str, response_text: str, result: dict, latency_ms: int) -> List[conversations.MessageCreate]:
+    """
+    User message plus assistant reply with its usage, ready to save
+
+    A coalesced reply shares the usage of the caller that made the upstream
+    call, so it is saved with zero tokens to keep the rollups at real spend.
+    """
+    coalesced = result.get("coalesced", False)
+    return [
+        conversations.MessageCreate(role="user", content=message),
+        conversations.MessageCreate(
+            role="assistant",
+            content=response_text,
+            model=result["model"],
+            input_tokens=0 if coalesced else result["tokens_used"]["input"],
+            output_tokens=0 if coalesced else result["tokens_used"]["output"],
+            stop_reason=result["stop_reason"],
+            latency_ms=latency_ms,
+            coalesced=coalesced
+        )
+    ]
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, db: Session = Depends(get_db)):
     """
     Main chat endpoint for Moo
 
     Handles both Learning Mode and Project Mode requests
     Integrates with Claude API for responses
+    Saves the turn with its token usage when conversation_id is given
     """
     try:
         if not claude_available:
@@ -111,13 +193,31 @@ async def chat(request: ChatRequest):
                 detail="Claude API service is not available. Please check API key configuration."
             )
 
+        # Check the target before spending tokens on a turn that cannot be saved
+        if request.conversation_id is not None and not await run_in_threadpool(
+            conversations.conversation_exists, db, request.conversation_id
+        ):
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
         # Get response from Claude
+        started = time.perf_counter()
         claude_response = await claude_service.chat(
             message=request.message,
             discipline=request.discipline,
             mode=request.mode,
             conversation_history=request.conversation_history
         )
+        latency_ms = int((time.perf_counter() - started) * 1000)
+
+        if request.conversation_id is not None:
+            saved = await run_in_threadpool(
+                conversations.save_chat_turn,
+                db,
+                request.conversation_id,
+                chat_turn_messages(request.message, claude_response["response"], claude_response, latency_ms)
+            )
+            if saved is None:
+                raise HTTPException(status_code=404, detail="Conversation not found")
 
         # TODO: Integrate calculation tools
         # TODO: Add RAG knowledge retrieval
@@ -128,48 +228,93 @@ async def chat(request: ChatRequest):
             mode=request.mode,
             timestamp=datetime.now(),
             tools_used=[],
-            sources=[]
+            sources=[],
+            model=claude_response["model"],
+            tokens_used=claude_response["tokens_used"],
+            stop_reason=claude_response["stop_reason"],
+            latency_ms=latency_ms,
+            coalesced=claude_response["coalesced"]
         )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def with_session(function, *args):
+    """Call function(db, *args) with a session opened and closed in this thread"""
+    db = SessionLocal()
+    try:
+        return function(db, *args)
+    finally:
+        db.close()
+
+async def check_stream_conversation(request: ChatRequest) -> Optional[str]:
+    """Reject a WebSocket stream for an unknown conversation before spending tokens"""
+    if request.conversation_id is None:
+        return None
+    if not await run_in_threadpool(with_session, conversations.conversation_exists, request.conversation_id):
+        return "Conversation not found"
+    return None
+
+async def save_stream_turn(request: ChatRequest, response_text: str, done: dict) -> None:
+    """Persist a finished WebSocket stream when it names a conversation"""
+    if request.conversation_id is None:
+        return
+
+    saved = await run_in_threadpool(
+        with_session,
+        conversations.save_chat_turn,
+        request.conversation_id,
+        chat_turn_messages(request.message, response_text, done, done["latency_ms"])
+    )
+    if saved is None:
+        # Deleted while streaming - reported as an error event instead of done
+        raise LookupError("Conversation not found")
+
+@app.websocket("/ws/chat")
+async def websocket_chat(websocket: WebSocket):
+    """
+    Streaming chat over one long-lived connection
+
+    Multiplexes several conversation streams per connection; a cancel
+    message aborts the upstream Claude stream immediately. See
+    app/services/chat_session.py for the message protocol.
+    """
+    # CORS does not apply to WebSockets, so check the origin here
+    origin = websocket.headers.get("origin")
+    if origin is not None and origin not in ALLOWED_ORIGINS:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+
+    if not claude_available or not connection_limiter.acquire():
+        # Closing before accept() rejects the handshake with a bare 403;
+        # accept first so the client sees 1013 and knows to retry
+        await websocket.accept()
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        return
+
+    try:
+        await websocket.accept()
+        await ChatSession(
+            websocket, claude_service, ChatRequest,
+            on_complete=save_stream_turn,
+            check_request=check_stream_conversation
+        ).run()
+    finally:
+        connection_limiter.release()
+
 @app.get("/disciplines")
-async def get_disciplines():
+async def get_disciplines(
+    response: Response,
+    if_none_match: Optional[str] = Header(None)
+):
     """Get available disciplines with metadata"""
-    return {
-        "disciplines": [
-            {
-                "id": "financial_accounting",
-                "name": "Financial Accounting",
-                "color": "#3b82f6",
-                "icon": "FileText",
-                "concepts": 8
-            },
-            {
-                "id": "cost_accounting",
-                "name": "Cost Accounting",
-                "color": "#C77A58",
-                "icon": "Calculator",
-                "concepts": 8
-            },
-            {
-                "id": "management_accounting",
-                "name": "Management Accounting",
-                "color": "#00A5CF",
-                "icon": "BarChart3",
-                "concepts": 8
-            },
-            {
-                "id": "financial_management",
-                "name": "Financial Management",
-                "color": "#10b981",
-                "icon": "Briefcase",
-                "concepts": 6
-            }
-        ]
-    }
+    if etag_matches(if_none_match, DISCIPLINES_ETAG):
+        return not_modified(DISCIPLINES_ETAG, DISCIPLINES_CACHE_CONTROL)
+
+    response.headers["ETag"] = DISCIPLINES_ETAG
+    response.headers["Cache-Control"] = DISCIPLINES_CACHE_CONTROL
+    return DISCIPLINES
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,4 +1,4 @@
 """API Routers"""
-from . import conversations, projects
+from . import conversations, projects, usage
 
-__all__ = ["conversations", "projects"]
+__all__ = ["conversations", "projects", "usage"]
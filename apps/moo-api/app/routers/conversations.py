@@ -3,21 +3,36 @@ Conversation API Endpoints
 Handles saving, loading, and managing chat conversations
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
 from ..database import get_db
-from ..database.models import Conversation, Message, Project, DisciplineEnum, ModeEnum
+from ..database.archive import load_messages, lock_for_append, promote_conversation
+from ..database.models import Conversation, ConversationArchive, Message, Project, DisciplineEnum, ModeEnum
+from ..database.usage import record_usage
+from ..cache import make_etag, etag_matches, not_modified
+from ..cache.sidebar import sidebar_cache, CONVERSATIONS, PROJECTS
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
 
+# Sidebar data is per-user and changes on every write, so clients must revalidate
+CACHE_CONTROL = "private, no-cache"
+
 # Pydantic models for API
 class MessageCreate(BaseModel):
     role: str
     content: str
+    # Claude usage for assistant messages (as returned by /chat)
+    model: Optional[str] = None
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    stop_reason: Optional[str] = None
+    latency_ms: Optional[int] = None
+    coalesced: Optional[bool] = None
 
 class ConversationCreate(BaseModel):
     title: Optional[str] = None
@@ -52,6 +67,47 @@ class ConversationDetail(BaseModel):
     class Config:
         from_attributes = True
 
+def insert_message(db: Session, conversation: Conversation, message: MessageCreate) -> Message:
+    """Add a message and fold its usage into the rollups (caller commits)"""
+    db_message = Message(
+        conversation_id=conversation.id,
+        role=message.role,
+        content=message.content,
+        model=message.model,
+        input_tokens=message.input_tokens,
+        output_tokens=message.output_tokens,
+        stop_reason=message.stop_reason,
+        latency_ms=message.latency_ms,
+        coalesced=message.coalesced,
+        created_at=datetime.utcnow()
+    )
+    db.add(db_message)
+    record_usage(db, conversation, db_message)
+    return db_message
+
+def conversation_exists(db: Session, conversation_id: int) -> bool:
+    return db.query(Conversation.id).filter(Conversation.id == conversation_id).first() is not None
+
+def save_chat_turn(db: Session, conversation_id: int, messages: List[MessageCreate]) -> Optional[Conversation]:
+    """
+    Append a /chat turn (user message + assistant reply) to a conversation
+
+    Returns None if the conversation does not exist.
+    """
+    conversation = lock_for_append(db, conversation_id)
+
+    if not conversation:
+        return None
+
+    promote_conversation(db, conversation)
+    for message in messages:
+        insert_message(db, conversation, message)
+
+    db.commit()
+
+    sidebar_cache.invalidate(conversation.user_id, CONVERSATIONS)
+    return conversation
+
 @router.post("/", response_model=ConversationResponse)
 def create_conversation(
     conversation: ConversationCreate,
@@ -82,16 +138,15 @@ def create_conversation(
 
     # Add messages
     for msg in conversation.messages:
-        db_message = Message(
-            conversation_id=db_conversation.id,
-            role=msg.role,
-            content=msg.content
-        )
-        db.add(db_message)
+        insert_message(db, db_conversation, msg)
 
     db.commit()
     db.refresh(db_conversation)
 
+    sidebar_cache.invalidate(db_conversation.user_id, CONVERSATIONS)
+    if db_conversation.project:
+        sidebar_cache.invalidate(db_conversation.project.user_id, PROJECTS)
+
     return ConversationResponse(
         id=db_conversation.id,
         title=db_conversation.title,
@@ -106,15 +161,47 @@ def create_conversation(
 @router.get("/{conversation_id}", response_model=ConversationDetail)
 def get_conversation(
     conversation_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get a specific conversation with all messages"""
+    """
+    Get a specific conversation with all messages
+
+    Returns 304 without loading message bodies when If-None-Match matches
+    """
     conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    messages = db.query(Message).filter(Message.conversation_id == conversation_id).all()
+    # Fingerprint from aggregates only - message content is not read here
+    if conversation.archive is not None:
+        message_count = conversation.archive.message_count
+        last_message_id = conversation.archive.last_message_id
+    else:
+        message_count, last_message_id = db.query(
+            func.count(Message.id),
+            func.max(Message.id)
+        ).filter(Message.conversation_id == conversation_id).one()
+
+    etag = make_etag(
+        "conversation",
+        conversation.id,
+        conversation.title,
+        conversation.updated_at,
+        message_count,
+        last_message_id
+    )
+
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, CACHE_CONTROL)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+    # Cold conversations are rehydrated from their archive
+    messages = load_messages(db, conversation)
 
     return ConversationDetail(
         id=conversation.id,
@@ -125,43 +212,86 @@ def get_conversation(
         created_at=conversation.created_at,
         messages=[
             {
-                "id": msg.id,
-                "role": msg.role,
-                "content": msg.content,
-                "created_at": msg.created_at.isoformat()
+                "id": msg["id"],
+                "role": msg["role"],
+                "content": msg["content"],
+                "created_at": msg["created_at"].isoformat()
             }
             for msg in messages
         ]
     )
 
+def _load_conversation_list(db: Session, user_id: Optional[str], skip: int, limit: int) -> dict:
+    """Query a conversation listing page and its ETag"""
+    query = db.query(Conversation)
+
+    if user_id:
+        query = query.filter(Conversation.user_id == user_id)
+
+    # Count and id sum catch deletes, max(updated_at) catches creates and new messages
+    count, last_updated, id_sum = query.with_entities(
+        func.count(Conversation.id),
+        func.max(Conversation.updated_at),
+        func.sum(Conversation.id)
+    ).one()
+
+    # Hot messages are counted in one grouped query; archived ones keep their count
+    hot_counts = query.join(Message, Message.conversation_id == Conversation.id).with_entities(
+        Conversation.id.label("conversation_id"),
+        func.count(Message.id).label("message_count")
+    ).group_by(Conversation.id).subquery()
+
+    rows = query.outerjoin(
+        ConversationArchive, ConversationArchive.conversation_id == Conversation.id
+    ).outerjoin(
+        hot_counts, hot_counts.c.conversation_id == Conversation.id
+    ).add_columns(
+        func.coalesce(ConversationArchive.message_count, hot_counts.c.message_count, 0)
+    ).order_by(Conversation.updated_at.desc()).offset(skip).limit(limit).all()
+
+    return {
+        "etag": make_etag("conversations", user_id, skip, limit, count, last_updated, id_sum),
+        "items": [
+            ConversationResponse(
+                id=conv.id,
+                title=conv.title,
+                mode=conv.mode.value,
+                discipline=conv.discipline.value,
+                is_anonymous=conv.is_anonymous,
+                created_at=conv.created_at,
+                updated_at=conv.updated_at,
+                message_count=message_count
+            ).model_dump(mode="json")
+            for conv, message_count in rows
+        ]
+    }
+
 @router.get("/", response_model=List[ConversationResponse])
 def list_conversations(
+    response: Response,
     user_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """List conversations for a user"""
-    query = db.query(Conversation)
-
     if user_id:
-        query = query.filter(Conversation.user_id == user_id)
-
-    conversations = query.order_by(Conversation.updated_at.desc()).offset(skip).limit(limit).all()
-
-    return [
-        ConversationResponse(
-            id=conv.id,
-            title=conv.title,
-            mode=conv.mode.value,
-            discipline=conv.discipline.value,
-            is_anonymous=conv.is_anonymous,
-            created_at=conv.created_at,
-            updated_at=conv.updated_at,
-            message_count=len(conv.messages)
+        listing = sidebar_cache.get_or_load(
+            user_id, CONVERSATIONS, (skip, limit),
+            lambda: _load_conversation_list(db, user_id, skip, limit)
         )
-        for conv in conversations
-    ]
+    else:
+        # Unfiltered listings change on any user's write, so they bypass the cache
+        listing = _load_conversation_list(db, None, skip, limit)
+
+    if etag_matches(if_none_match, listing["etag"]):
+        return not_modified(listing["etag"], CACHE_CONTROL)
+
+    response.headers["ETag"] = listing["etag"]
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+    return listing["items"]
 
 @router.post("/{conversation_id}/messages")
 def add_message(
@@ -170,21 +300,19 @@ def add_message(
     db: Session = Depends(get_db)
 ):
     """Add a message to an existing conversation"""
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    conversation = lock_for_append(db, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    db_message = Message(
-        conversation_id=conversation_id,
-        role=message.role,
-        content=message.content
-    )
+    # A new message brings an archived conversation back to the hot tier
+    promote_conversation(db, conversation)
 
-    db.add(db_message)
-    conversation.updated_at = datetime.utcnow()
+    db_message = insert_message(db, conversation, message)
     db.commit()
 
+    sidebar_cache.invalidate(conversation.user_id, CONVERSATIONS)
+
     return {"status": "success", "message_id": db_message.id}
 
 @router.delete("/{conversation_id}")
@@ -198,7 +326,13 @@ def delete_conversation(
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
+    user_id = conversation.user_id
+    project_owner_id = conversation.project.user_id if conversation.project else None
+
     db.delete(conversation)
     db.commit()
 
+    sidebar_cache.invalidate(user_id, CONVERSATIONS)
+    sidebar_cache.invalidate(project_owner_id, PROJECTS)
+
     return {"status": "deleted"}
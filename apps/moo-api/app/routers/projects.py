@@ -3,7 +3,8 @@ Projects API Endpoints
 Handles creating and managing projects (folders for conversations)
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
@@ -11,9 +12,14 @@ from datetime import datetime
 
 from ..database import get_db
 from ..database.models import Project, Conversation, DisciplineEnum
+from ..cache import make_etag, etag_matches, not_modified, touch
+from ..cache.sidebar import sidebar_cache, CONVERSATIONS, PROJECTS
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
+# Sidebar data is per-user and changes on every write, so clients must revalidate
+CACHE_CONTROL = "private, no-cache"
+
 class ProjectCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -48,6 +54,8 @@ def create_project(
     db.commit()
     db.refresh(db_project)
 
+    sidebar_cache.invalidate(db_project.user_id, PROJECTS)
+
     return ProjectResponse(
         id=db_project.id,
         name=db_project.name,
@@ -57,25 +65,60 @@ def create_project(
         conversation_count=0
     )
 
+def _load_project_list(db: Session, user_id: str) -> dict:
+    """Query a user's projects with conversation counts and their ETag"""
+    count, last_updated, id_sum = db.query(
+        func.count(Project.id),
+        func.max(Project.updated_at),
+        func.sum(Project.id)
+    ).filter(Project.user_id == user_id).one()
+
+    # conversation_count changes without touching the project row
+    conversation_count, conversation_id_sum = db.query(
+        func.count(Conversation.id),
+        func.sum(Conversation.id)
+    ).join(Project, Conversation.project_id == Project.id).filter(Project.user_id == user_id).one()
+
+    projects = db.query(Project).filter(Project.user_id == user_id).order_by(Project.updated_at.desc()).all()
+
+    return {
+        "etag": make_etag(
+            "projects", user_id, count, last_updated, id_sum,
+            conversation_count, conversation_id_sum
+        ),
+        "items": [
+            ProjectResponse(
+                id=proj.id,
+                name=proj.name,
+                description=proj.description,
+                discipline=proj.discipline.value,
+                created_at=proj.created_at,
+                conversation_count=len(proj.conversations)
+            ).model_dump(mode="json")
+            for proj in projects
+        ]
+    }
+
 @router.get("/", response_model=List[ProjectResponse])
 def list_projects(
     user_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """List all projects for a user"""
-    projects = db.query(Project).filter(Project.user_id == user_id).order_by(Project.updated_at.desc()).all()
+    listing = sidebar_cache.get_or_load(
+        user_id, PROJECTS, (),
+        lambda: _load_project_list(db, user_id)
+    )
+
+    if etag_matches(if_none_match, listing["etag"]):
+        return not_modified(listing["etag"], CACHE_CONTROL)
+
+    response.headers["ETag"] = listing["etag"]
+    response.headers["Cache-Control"] = CACHE_CONTROL
 
-    return [
-        ProjectResponse(
-            id=proj.id,
-            name=proj.name,
-            description=proj.description,
-            discipline=proj.discipline.value,
-            created_at=proj.created_at,
-            conversation_count=len(proj.conversations)
-        )
-        for proj in projects
-    ]
+    return listing["items"]
 
 @router.get("/{project_id}", response_model=ProjectResponse)
 def get_project(
@@ -115,9 +158,11 @@ def update_project(
     if description is not None:
         project.description = description
 
-    project.updated_at = datetime.utcnow()
+    touch(project)
     db.commit()
 
+    sidebar_cache.invalidate(project.user_id, PROJECTS)
+
     return {"status": "updated"}
 
 @router.delete("/{project_id}")
@@ -131,7 +176,15 @@ def delete_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    user_id = project.user_id
+    # Cascaded conversations disappear from their owners' sidebars too
+    conversation_owners = {conv.user_id for conv in project.conversations}
+
     db.delete(project)
     db.commit()
 
+    sidebar_cache.invalidate(user_id, PROJECTS)
+    for owner_id in conversation_owners:
+        sidebar_cache.invalidate(owner_id, CONVERSATIONS)
+
     return {"status": "deleted"}
@@ -0,0 +1,99 @@
+"""
+Usage API Endpoints
+Token, cost and latency reporting from the hourly / daily rollups
+"""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Literal, Optional
+from datetime import datetime, timedelta
+
+from ..database import get_db
+from ..database.models import UsageDaily, UsageHourly
+from ..database.usage import COUNTERS
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+DIMENSIONS = ("user_id", "discipline", "mode", "model")
+
+# USD per million tokens (input, output)
+MODEL_PRICING = {
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+}
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int) -> Optional[float]:
+    """Estimated USD cost, or None when the model is not in MODEL_PRICING"""
+    if model not in MODEL_PRICING:
+        return None
+    input_price, output_price = MODEL_PRICING[model]
+    return round((input_tokens * input_price + output_tokens * output_price) / 1_000_000, 6)
+
+def summarize(values: dict) -> dict:
+    """Add derived averages and cost to a row of summed counters"""
+    requests = values["requests"] or 0
+    values["avg_latency_ms"] = round(values.pop("latency_ms_total") / requests) if requests else None
+    if "model" in values:
+        values["estimated_cost_usd"] = estimate_cost(values["model"], values["input_tokens"], values["output_tokens"])
+    return values
+
+@router.get("")
+def get_usage(
+    granularity: Literal["hour", "day"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+    discipline: Optional[str] = None,
+    mode: Optional[str] = None,
+    model: Optional[str] = None,
+    group_by: str = "model",
+    db: Session = Depends(get_db)
+):
+    """
+    Usage totals per time bucket
+
+    Reads only the rollup tables. group_by is a comma-separated subset of
+    user_id, discipline, mode and model. The window defaults to the last
+    7 days for hourly buckets and 30 days for daily buckets.
+    """
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = set(dimensions) - set(DIMENSIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot group by: {', '.join(sorted(unknown))}")
+
+    rollup = UsageHourly if granularity == "hour" else UsageDaily
+    end = end or datetime.utcnow()
+    start = start or end - (timedelta(days=7) if granularity == "hour" else timedelta(days=30))
+
+    filters = [rollup.bucket_start >= start, rollup.bucket_start <= end]
+    for name, value in (("user_id", user_id), ("discipline", discipline), ("mode", mode), ("model", model)):
+        if value is not None:
+            filters.append(getattr(rollup, name) == value)
+
+    group_columns = [rollup.bucket_start] + [getattr(rollup, name) for name in dimensions]
+    sums = [func.sum(getattr(rollup, name)).label(name) for name in COUNTERS]
+
+    rows = db.query(*group_columns, *sums).filter(*filters).group_by(*group_columns).order_by(rollup.bucket_start).all()
+
+    buckets = []
+    totals = {name: 0 for name in COUNTERS}
+    for row in rows:
+        values = row._asdict()
+        for name in COUNTERS:
+            totals[name] += values[name] or 0
+        values["bucket_start"] = values["bucket_start"].isoformat()
+        buckets.append(summarize(values))
+
+    totals = summarize(totals)
+    if "model" in dimensions:
+        totals["estimated_cost_usd"] = round(sum(bucket["estimated_cost_usd"] or 0 for bucket in buckets), 6)
+
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "group_by": dimensions,
+        "buckets": buckets,
+        "totals": totals
+    }
@@ -0,0 +1,267 @@
+"""
+WebSocket Chat Sessions
+Multiplexes several Claude streams over one browser connection
+
+Client -> server messages:
+    {"type": "chat", "stream_id": "s1", "message": "...", "mode": ..., "discipline": ...,
+     "conversation_history": [...], "conversation_id": 12}
+    {"type": "cancel", "stream_id": "s1"}
+    {"type": "ping"} / {"type": "pong"}
+
+Server -> client messages (all stream events carry stream_id):
+    {"type": "text", "text": "..."}
+    {"type": "done", "model": ..., "tokens_used": {...}, "stop_reason": ..., "latency_ms": ...}
+    {"type": "cancelled"}
+    {"type": "error", "detail": "..."}
+    {"type": "ping"} / {"type": "pong"}
+"""
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, ValidationError
+from typing import Awaitable, Callable, Dict, Optional, Set, Type
+import asyncio
+import os
+import time
+
+# Per-worker limits - tune with environment variables
+MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "200"))
+MAX_STREAMS_PER_CONNECTION = int(os.getenv("WS_MAX_STREAMS", "4"))
+PING_INTERVAL_SECONDS = float(os.getenv("WS_PING_INTERVAL", "20"))
+IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+# Outgoing messages buffered per connection before producers wait on a slow client
+OUTBOX_SIZE = int(os.getenv("WS_OUTBOX_SIZE", "256"))
+# How long producers wait on a full outbox before the client is dropped
+SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT", "30"))
+
+# WebSocket close codes
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TRY_AGAIN_LATER = 1013
+
+class ConnectionLimiter:
+    """Caps concurrent WebSocket connections in this worker"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        if self.active >= self.limit:
+            self.rejected += 1
+            return False
+        self.active += 1
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+
+    def stats(self) -> Dict:
+        return {"active": self.active, "limit": self.limit, "rejected": self.rejected}
+
+connection_limiter = ConnectionLimiter(MAX_CONNECTIONS)
+
+class SlowClient(Exception):
+    """The client stopped reading and the outbox stayed full"""
+
+class ChatSession:
+    """One WebSocket connection carrying several concurrent chat streams"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        claude_service,
+        request_model: Type[BaseModel],
+        on_complete: Optional[Callable[[BaseModel, str, Dict], Awaitable[None]]] = None,
+        check_request: Optional[Callable[[BaseModel], Awaitable[Optional[str]]]] = None
+    ):
+        """
+        Args:
+            websocket: An accepted WebSocket
+            claude_service: ClaudeService used for chat_stream()
+            request_model: Validates "chat" messages (the /chat request model)
+            on_complete: Awaited with (request, response_text, done_event) when a stream
+                finishes, before "done" is sent; if it raises, an error is sent instead
+            check_request: Awaited with the request before streaming starts; a returned
+                string is sent as an error and the stream is not started
+        """
+        self.websocket = websocket
+        self.claude = claude_service
+        self.request_model = request_model
+        self.on_complete = on_complete
+        self.check_request = check_request
+        self.streams: Dict[str, asyncio.Task] = {}
+        # Streams whose upstream finished and that are being saved
+        self.completing: Set[str] = set()
+        self.saves: Set[asyncio.Task] = set()
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=OUTBOX_SIZE)
+
+    async def run(self) -> None:
+        """Serve the connection until the client leaves, idles out or stops reading"""
+        writer = asyncio.create_task(self._write_loop())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await self._read_loop()
+        except SlowClient:
+            await self._close(CLOSE_POLICY_VIOLATION)
+        finally:
+            # Disconnecting cancels every stream, which aborts their upstream calls
+            streams = list(self.streams.values())
+            for task in streams:
+                task.cancel()
+            await asyncio.gather(*streams, return_exceptions=True)
+            # Finished turns are still saved after the client has gone
+            await asyncio.gather(*list(self.saves), return_exceptions=True)
+            writer.cancel()
+            heartbeat.cancel()
+            await asyncio.gather(writer, heartbeat, return_exceptions=True)
+
+    async def send(self, message: Dict) -> None:
+        """Queue a message, waiting (backpressure) while the client is slow"""
+        try:
+            await asyncio.wait_for(self.outbox.put(message), SEND_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise SlowClient()
+
+    async def _write_loop(self) -> None:
+        # The only task that writes to the socket, so frames never interleave
+        while True:
+            message = await self.outbox.get()
+            try:
+                await self.websocket.send_json(message)
+            except (WebSocketDisconnect, RuntimeError):
+                return
+
+    async def _heartbeat(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(PING_INTERVAL_SECONDS)
+                await self.send({"type": "ping"})
+        except SlowClient:
+            await self._close(CLOSE_POLICY_VIOLATION)
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                # Any client message - including pong - counts as liveness
+                data = await asyncio.wait_for(self.websocket.receive_json(), IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                await self._close(CLOSE_GOING_AWAY)
+                return
+            except (WebSocketDisconnect, RuntimeError):
+                return  # Client left, or the socket was closed on our side
+            except ValueError:
+                await self.send({"type": "error", "detail": "Messages must be JSON"})
+                continue
+
+            if not isinstance(data, dict):
+                await self.send({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+
+            kind = data.get("type")
+            if kind == "chat":
+                await self._start(data)
+            elif kind == "cancel":
+                await self._cancel(data.get("stream_id"))
+            elif kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind != "pong":
+                await self.send({"type": "error", "detail": f"Unknown message type: {kind}"})
+
+    async def _start(self, data: Dict) -> None:
+        stream_id = data.get("stream_id")
+        if not isinstance(stream_id, str) or not stream_id:
+            await self.send({"type": "error", "detail": "stream_id is required"})
+            return
+        if stream_id in self.streams:
+            await self.send({"type": "error", "stream_id": stream_id, "detail": "stream_id already active"})
+            return
+        if len(self.streams) >= MAX_STREAMS_PER_CONNECTION:
+            await self.send({"type": "error", "stream_id": stream_id, "detail": "Too many concurrent streams"})
+            return
+
+        try:
+            request = self.request_model(**{k: v for k, v in data.items() if k not in ("type", "stream_id")})
+        except ValidationError as e:
+            await self.send({"type": "error", "stream_id": stream_id, "detail": str(e)})
+            return
+
+        if self.check_request is not None:
+            problem = await self.check_request(request)
+            if problem:
+                await self.send({"type": "error", "stream_id": stream_id, "detail": problem})
+                return
+
+        self.streams[stream_id] = asyncio.create_task(self._stream(stream_id, request))
+
+    async def _cancel(self, stream_id: Optional[str]) -> None:
+        task = self.streams.get(stream_id)
+        if task is None:
+            await self.send({"type": "error", "stream_id": stream_id, "detail": "No such active stream"})
+            return
+        if stream_id in self.completing:
+            return  # Too late - the reply is complete and "done" follows once saved
+        task.cancel()
+
+    async def _stream(self, stream_id: str, request: BaseModel) -> None:
+        started = time.perf_counter()
+        chunks = []
+        events = self.claude.chat_stream(
+            message=request.message,
+            discipline=request.discipline,
+            mode=request.mode,
+            conversation_history=request.conversation_history
+        )
+
+        try:
+            async for event in events:
+                if event["type"] == "text":
+                    chunks.append(event["text"])
+                else:
+                    event = {**event, "latency_ms": int((time.perf_counter() - started) * 1000)}
+
+                if event["type"] == "done" and self.on_complete is not None:
+                    await self._complete(stream_id, request, "".join(chunks), event)
+
+                await self.send({**event, "stream_id": stream_id})
+
+        except asyncio.CancelledError:
+            # Best effort - the socket may already be gone
+            try:
+                self.outbox.put_nowait({"type": "cancelled", "stream_id": stream_id})
+            except asyncio.QueueFull:
+                pass
+            raise
+        except SlowClient:
+            await self._close(CLOSE_POLICY_VIOLATION)
+        except Exception as e:
+            try:
+                await self.send({"type": "error", "stream_id": stream_id, "detail": str(e)})
+            except SlowClient:
+                await self._close(CLOSE_POLICY_VIOLATION)
+        finally:
+            # Unsubscribe immediately so a cancel aborts the upstream stream now
+            await events.aclose()
+            self.streams.pop(stream_id, None)
+
+    async def _complete(self, stream_id: str, request: BaseModel, response_text: str, done: Dict) -> None:
+        """
+        Persist a finished stream before "done" is reported
+
+        The save runs in its own task and is shielded, so a disconnect arriving
+        meanwhile cannot abort it halfway; run() waits for it before returning.
+        """
+        self.completing.add(stream_id)
+        save = asyncio.ensure_future(self.on_complete(request, response_text, done))
+        self.saves.add(save)
+        save.add_done_callback(self.saves.discard)
+        try:
+            await asyncio.shield(save)
+        finally:
+            self.completing.discard(stream_id)
+
+    async def _close(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except RuntimeError:
+            pass  # Already closed
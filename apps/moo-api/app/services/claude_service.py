@@ -4,18 +4,29 @@ Handles all interactions with Anthropic's Claude API
 """
 
 import os
-from typing import List, Dict, Optional
-from anthropic import Anthropic, HUMAN_PROMPT, AI_PROMPT
+import time
+from typing import AsyncIterator, List, Dict, Optional
+from anthropic import AsyncAnthropic
 import anthropic
 
+from .single_flight import SingleFlight, request_key
+from .model_router import ModelRouter, RouteDecision
+
 class ClaudeService:
     def __init__(self):
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set")
 
-        self.client = Anthropic(api_key=api_key)
-        self.model = "claude-sonnet-4-20250514"  # Claude Sonnet 4
+        self.client = AsyncAnthropic(api_key=api_key)
+        self.max_tokens = 4096
+
+        # Picks a fast or deep model per request (MODEL_ROUTING_CONFIG overrides the rules)
+        self.router = ModelRouter.from_env()
+        self.model = self.router.default_model
+
+        # Identical concurrent requests (e.g. suggested-question chips) share one upstream call
+        self.single_flight = SingleFlight()
 
     def get_system_prompt(self, discipline: str, mode: str) -> str:
         """
@@ -133,6 +144,30 @@ Show connections across all four disciplines:
 
         return base_prompt + mode_prompt + discipline_addition
 
+    def build_messages(
+        self,
+        message: str,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """Build the Claude messages list from history plus the new user message"""
+        messages = []
+
+        # Add conversation history if provided
+        if conversation_history:
+            for msg in conversation_history:
+                messages.append({
+                    "role": msg["role"],
+                    "content": msg["content"]
+                })
+
+        # Add current message
+        messages.append({
+            "role": "user",
+            "content": message
+        })
+
+        return messages
+
     async def chat(
         self,
         message: str,
@@ -143,6 +178,10 @@ Show connections across all four disciplines:
         """
         Send a message to Claude and get a response
 
+        The model is chosen per request by the router, escalating to the
+        next model on retryable errors. Concurrent identical requests are
+        coalesced into one upstream call.
+
         Args:
             message: User's message
             discipline: One of the four disciplines or "all"
@@ -150,34 +189,83 @@ Show connections across all four disciplines:
             conversation_history: Previous messages in the conversation
 
         Returns:
-            Dict with response and metadata
+            Dict with response and metadata. "coalesced" is True when the
+            upstream call was made for another caller, whose tokens_used
+            this result shares.
         """
         try:
             system_prompt = self.get_system_prompt(discipline, mode)
+            messages = self.build_messages(message, conversation_history)
+            decision = self.router.route(message, discipline, mode, messages, system_prompt)
+
+            key = request_key(",".join(decision.models), system_prompt, messages)
+            result, leader = await self.single_flight.do(key, lambda: self._create(decision, system_prompt, messages))
+            result["coalesced"] = not leader
+            return result
+
+        except anthropic.APIError as e:
+            raise Exception(f"Claude API error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Unexpected error: {str(e)}")
+
+    async def chat_stream(
+        self,
+        message: str,
+        discipline: str = "all",
+        mode: str = "learning",
+        conversation_history: Optional[List[Dict]] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream a response from Claude as events
+
+        Yields {"type": "text", "text": ...} chunks followed by one
+        {"type": "done", ...} event carrying the same metadata as chat(),
+        including "coalesced".
+        Identical concurrent streams share one upstream stream; late joiners
+        receive the already-streamed prefix first. Closing the iterator (or
+        cancelling its task) aborts the upstream once no other caller shares it.
+        """
+        system_prompt = self.get_system_prompt(discipline, mode)
+        messages = self.build_messages(message, conversation_history)
+        decision = self.router.route(message, discipline, mode, messages, system_prompt)
+
+        key = request_key(",".join(decision.models), system_prompt, messages)
+        events, leader = self.single_flight.stream(key, lambda: self._stream(decision, system_prompt, messages))
+
+        try:
+            async for event in events:
+                if event["type"] == "done":
+                    event = {**event, "coalesced": not leader}
+                yield event
+        except anthropic.APIError as e:
+            raise Exception(f"Claude API error: {str(e)}")
+        finally:
+            # Leaving early unsubscribes now, aborting the upstream if we were the last reader
+            await events.aclose()
+
+    async def _create(self, decision: RouteDecision, system_prompt: str, messages: List[Dict]) -> Dict:
+        """Make one buffered upstream call, escalating along the route on retryable errors"""
+        for attempt, model in enumerate(decision.models):
+            started = time.perf_counter()
+            try:
+                response = await self.client.messages.create(
+                    model=model,
+                    max_tokens=self.max_tokens,
+                    system=system_prompt,
+                    messages=messages
+                )
+            except anthropic.APIError as e:
+                escalate = attempt + 1 < len(decision.models) and self.router.should_escalate(e)
+                self.router.record_error(model, escalated=escalate)
+                if escalate:
+                    continue
+                raise
 
-            # Build conversation messages
-            messages = []
-
-            # Add conversation history if provided
-            if conversation_history:
-                for msg in conversation_history:
-                    messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-
-            # Add current message
-            messages.append({
-                "role": "user",
-                "content": message
-            })
-
-            # Call Claude API
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=system_prompt,
-                messages=messages
+            self.router.record_success(
+                model,
+                latency_ms=(time.perf_counter() - started) * 1000,
+                input_tokens=response.usage.input_tokens,
+                output_tokens=response.usage.output_tokens
             )
 
             # Extract response text
@@ -185,7 +273,7 @@ Show connections across all four disciplines:
 
             return {
                 "response": response_text,
-                "model": self.model,
+                "model": model,
                 "tokens_used": {
                     "input": response.usage.input_tokens,
                     "output": response.usage.output_tokens
@@ -193,10 +281,52 @@ Show connections across all four disciplines:
                 "stop_reason": response.stop_reason
             }
 
-        except anthropic.APIError as e:
-            raise Exception(f"Claude API error: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Unexpected error: {str(e)}")
+    async def _stream(self, decision: RouteDecision, system_prompt: str, messages: List[Dict]) -> AsyncIterator[Dict]:
+        """
+        Make one streaming upstream call
+
+        Escalation is only possible before the first chunk has been sent;
+        after that, errors propagate to subscribers.
+        """
+        for attempt, model in enumerate(decision.models):
+            started = time.perf_counter()
+            streamed = False
+            try:
+                async with self.client.messages.stream(
+                    model=model,
+                    max_tokens=self.max_tokens,
+                    system=system_prompt,
+                    messages=messages
+                ) as stream:
+                    async for text in stream.text_stream:
+                        streamed = True
+                        yield {"type": "text", "text": text}
+
+                    final = await stream.get_final_message()
+            except anthropic.APIError as e:
+                escalate = not streamed and attempt + 1 < len(decision.models) and self.router.should_escalate(e)
+                self.router.record_error(model, escalated=escalate)
+                if escalate:
+                    continue
+                raise
+
+            self.router.record_success(
+                model,
+                latency_ms=(time.perf_counter() - started) * 1000,
+                input_tokens=final.usage.input_tokens,
+                output_tokens=final.usage.output_tokens
+            )
+
+            yield {
+                "type": "done",
+                "model": model,
+                "tokens_used": {
+                    "input": final.usage.input_tokens,
+                    "output": final.usage.output_tokens
+                },
+                "stop_reason": final.stop_reason
+            }
+            return
 
     def estimate_tokens(self, text: str) -> int:
         """Rough estimate of tokens in text (1 token ≈ 4 characters)"""
@@ -0,0 +1,258 @@
+"""
+Model Routing
+Picks a fast or deep Claude model per request and tracks per-model metrics
+
+Rules are plain data (DEFAULT_ROUTING, or a JSON file named by
+MODEL_ROUTING_CONFIG) so routing can be tuned without code changes.
+The first matching rule wins; requests no rule matches use default_model.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import json
+import os
+import re
+
+import anthropic
+
+FAST_MODEL = "claude-3-5-haiku-20241022"  # Claude 3.5 Haiku
+DEEP_MODEL = "claude-sonnet-4-20250514"  # Claude Sonnet 4
+
+DEFAULT_ROUTING = {
+    "default_model": DEEP_MODEL,
+    # Use the keyword classifier below; set to null to disable it
+    "classifier": "keywords",
+    "models": {
+        FAST_MODEL: {"max_input_tokens": 8000, "fallback": DEEP_MODEL},
+        DEEP_MODEL: {"max_input_tokens": 180000, "fallback": None}
+    },
+    "rules": [
+        {
+            # One-line "what is X" questions early in a learning conversation
+            "name": "learning-quick-question",
+            "model": FAST_MODEL,
+            "mode": ["learning"],
+            "max_message_chars": 280,
+            "max_history": 4,
+            "complexity": "simple"
+        }
+    ]
+}
+
+# Signals that a question asks for work - calculations or multi-step analysis.
+# Topic nouns (NPV, variance, ...) are not here: "What is NPV?" is a definition.
+COMPLEX_PATTERN = re.compile(
+    r"\b(calculate|compute|compare|analy[sz]e|evaluate|prepare|build|design|"
+    r"reconcile|forecast|scenario|walk me through|"
+    r"step[- ]by[- ]step|worked example|practice problem)\b",
+    re.IGNORECASE
+)
+SIMPLE_PATTERN = re.compile(
+    r"^\s*(what('s| is| are)|define|definition of|meaning of|who|when|"
+    r"is it|does|difference between)\b",
+    re.IGNORECASE
+)
+# Longest message still treated as a one-line question
+SHORT_QUESTION_CHARS = 160
+
+def is_short_question(message: str) -> bool:
+    """A single sentence of at most SHORT_QUESTION_CHARS characters"""
+    text = message.strip()
+    return len(text) <= SHORT_QUESTION_CHARS and len(re.findall(r"[.?!](\s|$)", text)) <= 1
+
+def classify_complexity(message: str) -> str:
+    """
+    Lightweight local classifier - "simple" or "complex"
+
+    Keyword heuristics only, so it adds microseconds rather than a model call.
+    Short definitional questions are simple before any keyword is considered.
+    """
+    many_numbers = len(re.findall(r"\d[\d,.]*", message)) >= 3
+    if is_short_question(message) and SIMPLE_PATTERN.search(message) and not many_numbers:
+        return "simple"
+    if COMPLEX_PATTERN.search(message) or many_numbers:
+        return "complex"
+    if len(message) < 80:
+        return "simple"
+    return "complex"
+
+def estimate_tokens(text: str) -> int:
+    """Rough estimate of tokens in text (1 token ≈ 4 characters)"""
+    return len(text) // 4
+
+@dataclass
+class RouteDecision:
+    """Chosen model plus the escalation chain to try on errors"""
+    models: List[str]
+    rule: Optional[str]
+    complexity: Optional[str]
+    estimated_input_tokens: int
+
+    @property
+    def model(self) -> str:
+        return self.models[0]
+
+@dataclass
+class ModelMetrics:
+    """Per-model latency and token counters"""
+    requests: int = 0
+    errors: int = 0
+    escalations: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latencies_ms: deque = field(default_factory=lambda: deque(maxlen=1000))
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.latencies_ms)
+
+        def percentile(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 1)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "escalations": self.escalations,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p95_ms": percentile(0.95)
+        }
+
+class ModelRouter:
+    """Rule-based model router with fallback / escalation"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = config or DEFAULT_ROUTING
+        self.default_model = self.config["default_model"]
+        self.models = self.config.get("models", {})
+        self.rules = self.config.get("rules", [])
+        self.classifier = self.config.get("classifier")
+        self.metrics: Dict[str, ModelMetrics] = {}
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        """Load rules from MODEL_ROUTING_CONFIG if set, else use DEFAULT_ROUTING"""
+        path = os.getenv("MODEL_ROUTING_CONFIG")
+        if not path:
+            return cls()
+        return cls.from_file(path)
+
+    @classmethod
+    def from_file(cls, path: str) -> "ModelRouter":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def route(
+        self,
+        message: str,
+        discipline: str,
+        mode: str,
+        messages: List[Dict],
+        system_prompt: str = ""
+    ) -> RouteDecision:
+        """
+        Choose a model for a request
+
+        Args:
+            message: The new user message
+            discipline: One of the four disciplines or "all"
+            mode: "learning" or "project"
+            messages: Full messages list sent upstream (history + message)
+            system_prompt: System prompt, counted towards input length
+        """
+        history_size = max(len(messages) - 1, 0)
+        complexity = classify_complexity(message) if self.classifier == "keywords" else None
+        estimated = estimate_tokens(system_prompt) + sum(
+            estimate_tokens(str(msg["content"])) for msg in messages
+        )
+
+        model, rule_name = self.default_model, None
+        for rule in self.rules:
+            if self._matches(rule, message, discipline, mode, history_size, complexity):
+                model, rule_name = rule["model"], rule.get("name")
+                break
+
+        return RouteDecision(
+            models=self._escalation_chain(model, estimated),
+            rule=rule_name,
+            complexity=complexity,
+            estimated_input_tokens=estimated
+        )
+
+    def _matches(
+        self,
+        rule: Dict,
+        message: str,
+        discipline: str,
+        mode: str,
+        history_size: int,
+        complexity: Optional[str]
+    ) -> bool:
+        if "mode" in rule and mode not in rule["mode"]:
+            return False
+        if "discipline" in rule and discipline not in rule["discipline"]:
+            return False
+        if "max_message_chars" in rule and len(message) > rule["max_message_chars"]:
+            return False
+        if "max_history" in rule and history_size > rule["max_history"]:
+            return False
+        # Without a classifier, complexity-gated rules never match
+        if "complexity" in rule and complexity != rule["complexity"]:
+            return False
+        return True
+
+    def _escalation_chain(self, model: str, estimated_input_tokens: int) -> List[str]:
+        """
+        Follow fallback links from model, skipping models the input is too long for
+
+        The last model in the chain is always kept so there is something to try.
+        """
+        chain = []
+        current = model
+        while current and current not in chain:
+            chain.append(current)
+            current = self.models.get(current, {}).get("fallback")
+
+        fitting = [
+            m for m in chain
+            if estimated_input_tokens <= self.models.get(m, {}).get("max_input_tokens", float("inf"))
+        ]
+        return fitting or chain[-1:]
+
+    @staticmethod
+    def should_escalate(error: Exception) -> bool:
+        """Whether an upstream error is worth retrying on the next model"""
+        if isinstance(error, (
+            anthropic.APIConnectionError,
+            anthropic.RateLimitError,
+            anthropic.InternalServerError
+        )):
+            return True
+        # Over-length inputs the estimate missed
+        return isinstance(error, anthropic.BadRequestError) and "too long" in str(error).lower()
+
+    def _metrics(self, model: str) -> ModelMetrics:
+        if model not in self.metrics:
+            self.metrics[model] = ModelMetrics()
+        return self.metrics[model]
+
+    def record_success(self, model: str, latency_ms: float, input_tokens: int, output_tokens: int) -> None:
+        metrics = self._metrics(model)
+        metrics.requests += 1
+        metrics.input_tokens += input_tokens
+        metrics.output_tokens += output_tokens
+        metrics.latencies_ms.append(latency_ms)
+
+    def record_error(self, model: str, escalated: bool) -> None:
+        metrics = self._metrics(model)
+        metrics.requests += 1
+        metrics.errors += 1
+        if escalated:
+            metrics.escalations += 1
+
+    def stats(self) -> Dict:
+        """Per-model latency and token metrics for the health endpoint"""
+        return {model: metrics.summary() for model, metrics in self.metrics.items()}
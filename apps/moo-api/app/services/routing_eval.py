@@ -0,0 +1,124 @@
+"""
+Offline Routing Evaluation
+Replays stored Message history against routing rules without calling Claude
+
+Usage:
+    python -m app.services.routing_eval --rules rules.json [--baseline old.json] [--limit 1000]
+
+Every stored user message is routed with the history that preceded it, as
+/chat would have seen it. The report shows how traffic splits across models
+and rules, the input tokens each model would receive, and the length of the
+answers that were actually given (a rough proxy for how much depth a question
+needed). With --baseline, decisions are diffed against a second rule set.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+
+from ..database import SessionLocal
+from ..database.archive import load_messages
+from ..database.models import Conversation
+from .model_router import ModelRouter, RouteDecision
+
+def replay_turns(db, limit: Optional[int] = None) -> Iterator[Tuple[Conversation, List[Dict], str, Optional[str]]]:
+    """
+    Yield (conversation, history, user_message, assistant_reply) for stored turns
+
+    Messages are loaded one conversation at a time so memory stays bounded.
+    """
+    produced = 0
+    for conversation in db.query(Conversation).order_by(Conversation.id).all():
+        # Includes archived conversations, rehydrated from the cold tier
+        messages = load_messages(db, conversation)
+
+        history: List[Dict] = []
+        for index, msg in enumerate(messages):
+            if msg["role"] == "user":
+                following = messages[index + 1] if index + 1 < len(messages) else None
+                reply = following["content"] if following is not None and following["role"] == "assistant" else None
+                yield conversation, list(history), msg["content"], reply
+
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+
+            history.append({"role": msg["role"], "content": msg["content"]})
+
+def route_turn(router: ModelRouter, conversation: Conversation, history: List[Dict], message: str) -> RouteDecision:
+    """Route one replayed turn the way ClaudeService.chat would"""
+    messages = history + [{"role": "user", "content": message}]
+    # The system prompt (~1k characters) is left out of the length estimate
+    return router.route(message, conversation.discipline.value, conversation.mode.value, messages)
+
+def evaluate(router: ModelRouter, baseline: Optional[ModelRouter] = None, limit: Optional[int] = None) -> Dict:
+    """Build the evaluation report"""
+    turns = 0
+    by_model: Dict[str, Dict] = defaultdict(lambda: {"turns": 0, "input_tokens": 0, "reply_chars": 0, "replies": 0})
+    by_rule: Dict[str, int] = defaultdict(int)
+    changed: List[Dict] = []
+    changed_count = 0
+
+    db = SessionLocal()
+    try:
+        for conversation, history, message, reply in replay_turns(db, limit):
+            turns += 1
+            decision = route_turn(router, conversation, history, message)
+
+            model_stats = by_model[decision.model]
+            model_stats["turns"] += 1
+            model_stats["input_tokens"] += decision.estimated_input_tokens
+            if reply is not None:
+                model_stats["replies"] += 1
+                model_stats["reply_chars"] += len(reply)
+            by_rule[decision.rule or "default"] += 1
+
+            if baseline is not None:
+                previous = route_turn(baseline, conversation, history, message)
+                if previous.model != decision.model:
+                    changed_count += 1
+                    if len(changed) < 20:
+                        changed.append({
+                            "conversation_id": conversation.id,
+                            "message": message[:80],
+                            "baseline": previous.model,
+                            "candidate": decision.model
+                        })
+    finally:
+        db.close()
+
+    report = {
+        "turns": turns,
+        "models": {
+            model: {
+                "turns": stats["turns"],
+                "share": round(stats["turns"] / turns, 4) if turns else 0.0,
+                "estimated_input_tokens": stats["input_tokens"],
+                "avg_reply_chars": round(stats["reply_chars"] / stats["replies"]) if stats["replies"] else None
+            }
+            for model, stats in by_model.items()
+        },
+        "rules": dict(by_rule)
+    }
+
+    if baseline is not None:
+        report["changed_decisions"] = changed_count
+        report["changed_examples"] = changed
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored messages against model routing rules")
+    parser.add_argument("--rules", help="Routing config JSON (defaults to the built-in rules)")
+    parser.add_argument("--baseline", help="Second routing config JSON to diff decisions against")
+    parser.add_argument("--limit", type=int, help="Stop after this many user turns")
+    args = parser.parse_args()
+
+    router = ModelRouter.from_file(args.rules) if args.rules else ModelRouter()
+    baseline = ModelRouter.from_file(args.baseline) if args.baseline else None
+
+    print(json.dumps(evaluate(router, baseline, args.limit), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Single-Flight Request Coalescing
+Shares one upstream Claude call between identical concurrent requests
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+def request_key(model: str, system_prompt: str, messages: List[Dict]) -> str:
+    """Fingerprint a Claude request - identical keys share one upstream call"""
+    payload = json.dumps(
+        {"model": model, "system": system_prompt, "messages": messages},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class StreamCancelled(Exception):
+    """The shared upstream stream was aborted before it finished"""
+
+class StreamFlight:
+    """
+    One in-flight upstream stream replayed to any number of subscribers
+
+    Every item the source yields is kept, so a subscriber that joins late
+    first receives the already-streamed prefix and then follows live. When
+    the last subscriber leaves before the end, the upstream is cancelled so
+    no further tokens are spent.
+    """
+
+    def __init__(self, source: AsyncIterator[Any], on_done: Callable[["StreamFlight"], None]):
+        self.items: List[Any] = []
+        self.done = False
+        self.cancelled = False
+        self.subscribers = 0
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self._on_done = on_done
+        self.task = asyncio.ensure_future(self._run(source))
+
+    async def _run(self, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                self.items.append(item)
+                async with self._changed:
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._on_done(self)
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """Yield every item from the start of the stream, then follow live"""
+        index = 0
+        self.subscribers += 1
+        try:
+            while True:
+                while index < len(self.items):
+                    yield self.items[index]
+                    index += 1
+
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    if self.cancelled:
+                        raise StreamCancelled()
+                    return
+
+                async with self._changed:
+                    await self._changed.wait_for(lambda: index < len(self.items) or self.done)
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.cancel()
+
+    def cancel(self) -> None:
+        """Abort the upstream stream and stop new callers from joining it"""
+        self.cancelled = True
+        self._on_done(self)
+        self.task.cancel()
+
+class SingleFlight:
+    """In-flight deduplication for buffered and streaming upstream calls"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, StreamFlight] = {}
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        self.upstream_streams = 0
+        self.coalesced_streams = 0
+        self.cancelled_streams = 0
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run factory() once per key while it is in flight
+
+        Callers that arrive while the first call is running await the same
+        result. shield() keeps one caller disconnecting from cancelling the
+        upstream request for everyone else.
+
+        Returns (result, leader) - leader is True only for the caller whose
+        factory() ran, so upstream cost can be attributed exactly once.
+        """
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+            self.upstream_calls += 1
+            call = asyncio.ensure_future(factory())
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._forget(self._calls, key, done))
+        else:
+            self.coalesced_calls += 1
+
+        result = await asyncio.shield(call)
+        # Each caller gets its own copy so nobody can mutate a shared result
+        return copy.deepcopy(result), leader
+
+    def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> Tuple[AsyncIterator[Any], bool]:
+        """
+        Subscribe to the in-flight stream for key, starting it if needed
+
+        Returns (items, leader) - leader is True for the subscriber that
+        started the upstream stream.
+        """
+        flight = self._streams.get(key)
+        leader = flight is None
+        if leader:
+            self.upstream_streams += 1
+            flight = StreamFlight(factory(), on_done=lambda done: self._stream_done(key, done))
+            self._streams[key] = flight
+        else:
+            self.coalesced_streams += 1
+
+        return flight.subscribe(), leader
+
+    def _stream_done(self, key: str, flight: StreamFlight) -> None:
+        # Called again when the cancelled task finishes - count it once
+        if flight.cancelled and self._streams.get(key) is flight:
+            self.cancelled_streams += 1
+        self._forget(self._streams, key, flight)
+
+    @staticmethod
+    def _forget(flights: Dict, key: str, flight: Any) -> None:
+        # Only drop the entry if it still belongs to this flight
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def stats(self) -> Dict:
+        """Coalescing counters for the health endpoint"""
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced_calls": self.coalesced_calls,
+            "upstream_streams": self.upstream_streams,
+            "coalesced_streams": self.coalesced_streams,
+            "cancelled_streams": self.cancelled_streams,
+            "in_flight": len(self._calls) + len(self._streams)
+        }
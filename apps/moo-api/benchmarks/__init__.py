@@ -0,0 +1,8 @@
+"""
+Moo API Benchmarks
+Offline load and latency benchmarks against a mock Anthropic server
+
+    python -m benchmarks.datagen --database-url sqlite:///./bench.db --users 200
+    python -m benchmarks.run --database-url sqlite:///./bench.db --save-baseline
+    python -m benchmarks.run --database-url sqlite:///./bench.db
+"""
@@ -0,0 +1,207 @@
+"""
+Benchmark Data Generator
+Fills the database with realistic users, projects, conversations and messages
+
+    python -m benchmarks.datagen --database-url sqlite:///./bench.db --users 200
+
+Writes to the given SQLite or Postgres database, never to DATABASE_URL, and
+marks it as a benchmark dataset - benchmarks.run only runs against marked
+databases. Rows are inserted in batches through SQLAlchemy Core, so millions
+of messages load in minutes.
+Per-user activity is skewed - a few heavy users own most conversations, as
+in real traffic - and timestamps are spread over the last --days days.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List
+import argparse
+import os
+import random
+import sys
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine, func, inspect, select, text
+
+BATCH_SIZE = 5000
+
+# Marks a database as generated here, so benchmarks never touch real data
+DATASET_TABLE = Table(
+    "benchmark_dataset", MetaData(),
+    Column("generated_at", DateTime, nullable=False),
+    Column("seed", Integer, nullable=False)
+)
+
+def is_benchmark_database(url: str) -> bool:
+    """Whether url points at a database filled by this module"""
+    engine = create_engine(url)
+    try:
+        return inspect(engine).has_table(DATASET_TABLE.name)
+    finally:
+        engine.dispose()
+
+def has_conversations(url: str) -> bool:
+    engine = create_engine(url)
+    try:
+        if not inspect(engine).has_table("conversations"):
+            return False
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT 1 FROM conversations LIMIT 1")).first() is not None
+    finally:
+        engine.dispose()
+
+USER_PREFIX = "bench-user-"
+
+QUESTIONS = [
+    "What is the difference between FIFO and LIFO?",
+    "Explain break-even analysis",
+    "How do I calculate NPV for a five-year project with uneven cash flows?",
+    "What is a contribution margin?",
+    "Walk me through activity-based costing for a bakery with three products",
+    "Define working capital",
+    "How do accruals affect the income statement?",
+    "Compare IRR and NPV when ranking mutually exclusive projects",
+]
+
+PROJECT_NAMES = [
+    "Q3 Budget Review", "Capex Proposal", "Product Costing", "Audit Prep",
+    "Pricing Study", "Cash Flow Forecast", "Variance Report", "Make or Buy",
+]
+
+FILLER = (
+    "The analysis starts from the trial balance and allocates overhead using "
+    "direct labour hours before comparing the result with the standard cost. "
+)
+
+def skewed_count(rng: random.Random, mean: int) -> int:
+    """Pareto-ish count with the given mean - most users light, a few heavy"""
+    return max(1, int(rng.paretovariate(1.5) * mean / 3))
+
+def assistant_reply(rng: random.Random) -> str:
+    return FILLER * rng.randint(3, 30)
+
+def user_message(rng: random.Random) -> str:
+    question = rng.choice(QUESTIONS)
+    if rng.random() < 0.3:
+        question += " " + FILLER * rng.randint(1, 4)
+    return question
+
+def flush(engine, table, rows: List[Dict]) -> None:
+    if rows:
+        with engine.begin() as connection:
+            connection.execute(table.insert(), rows)
+        rows.clear()
+
+def generate(users: int, projects: int, conversations: int, messages: int, days: int, seed: int) -> Dict:
+    """Generate the dataset into DATABASE_URL and return row counts"""
+    from app.database import engine, init_db
+    from app.database.models import Conversation, DisciplineEnum, Message, ModeEnum, Project
+
+    rng = random.Random(seed)
+    init_db()
+    DATASET_TABLE.create(engine, checkfirst=True)
+
+    now = datetime.utcnow()
+    counts = {"users": users, "projects": 0, "conversations": 0, "messages": 0}
+
+    # Ids are assigned here so messages can reference conversations in the same batch
+    with engine.connect() as connection:
+        next_project_id = (connection.execute(select(func.max(Project.id))).scalar() or 0) + 1
+        next_conversation_id = (connection.execute(select(func.max(Conversation.id))).scalar() or 0) + 1
+
+    project_rows: List[Dict] = []
+    conversation_rows: List[Dict] = []
+    message_rows: List[Dict] = []
+
+    for user_index in range(users):
+        user_id = f"{USER_PREFIX}{user_index:05d}"
+
+        user_projects = []
+        for _ in range(rng.randint(0, projects * 2)):
+            created = now - timedelta(days=rng.uniform(0, days))
+            project_rows.append({
+                "id": next_project_id,
+                "user_id": user_id,
+                "name": rng.choice(PROJECT_NAMES),
+                "description": FILLER if rng.random() < 0.5 else None,
+                "discipline": rng.choice(list(DisciplineEnum)).name,
+                "created_at": created,
+                "updated_at": created
+            })
+            user_projects.append(next_project_id)
+            next_project_id += 1
+            counts["projects"] += 1
+
+        for _ in range(skewed_count(rng, conversations)):
+            started = now - timedelta(days=rng.uniform(0, days))
+            message_count = skewed_count(rng, messages)
+            timestamp = started
+
+            for index in range(message_count):
+                timestamp += timedelta(seconds=rng.randint(5, 600))
+                is_user = index % 2 == 0
+                message_rows.append({
+                    "conversation_id": next_conversation_id,
+                    "role": "user" if is_user else "assistant",
+                    "content": user_message(rng) if is_user else assistant_reply(rng),
+                    "created_at": timestamp
+                })
+
+            conversation_rows.append({
+                "id": next_conversation_id,
+                "user_id": user_id,
+                "project_id": rng.choice(user_projects) if user_projects and rng.random() < 0.4 else None,
+                "title": rng.choice(QUESTIONS)[:50],
+                "mode": rng.choice(list(ModeEnum)).name,
+                "discipline": rng.choice(list(DisciplineEnum)).name,
+                "is_anonymous": False,
+                "created_at": started,
+                "updated_at": timestamp
+            })
+            next_conversation_id += 1
+            counts["conversations"] += 1
+            counts["messages"] += message_count
+
+            # Parents first so foreign keys hold on Postgres
+            if len(message_rows) >= BATCH_SIZE:
+                flush(engine, Project.__table__, project_rows)
+                flush(engine, Conversation.__table__, conversation_rows)
+                flush(engine, Message.__table__, message_rows)
+
+    flush(engine, Project.__table__, project_rows)
+    flush(engine, Conversation.__table__, conversation_rows)
+    flush(engine, Message.__table__, message_rows)
+    flush(engine, DATASET_TABLE, [{"generated_at": now, "seed": seed}])
+
+    if engine.dialect.name == "postgresql":
+        # Explicit ids do not advance serial sequences
+        with engine.begin() as connection:
+            for table in ("projects", "conversations", "messages"):
+                connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                ))
+
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a benchmark database with realistic data")
+    parser.add_argument("--database-url", required=True, help="SQLite or Postgres URL of a dedicated benchmark database")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--projects", type=int, default=3, help="Mean projects per user")
+    parser.add_argument("--conversations", type=int, default=40, help="Mean conversations per user")
+    parser.add_argument("--messages", type=int, default=12, help="Mean messages per conversation")
+    parser.add_argument("--days", type=int, default=180, help="Spread timestamps over this many days")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if has_conversations(args.database_url) and not is_benchmark_database(args.database_url):
+        sys.exit(f"{args.database_url} already holds conversations that benchmarks.datagen did not create - "
+                 "use an empty database")
+
+    # The app reads DATABASE_URL when app.database is first imported
+    os.environ["DATABASE_URL"] = args.database_url
+    counts = generate(args.users, args.projects, args.conversations, args.messages, args.days, args.seed)
+    print(f"Generated {counts['users']} users, {counts['projects']} projects, "
+          f"{counts['conversations']} conversations, {counts['messages']} messages")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Mock Anthropic Server
+Local stand-in for the Messages API with configurable latency and failures
+
+Run standalone:
+    python -m benchmarks.mock_anthropic --port 8089 --latency-ms 400 --tokens-per-second 80
+
+Then point the API at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8089.
+Supports buffered and streaming (SSE) responses, error injection
+(429 rate limit / 529 overloaded / 500) and reports how many upstream
+calls it received at GET /_stats.
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from dataclasses import dataclass
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+@dataclass
+class MockConfig:
+    """Knobs for the mock upstream"""
+    latency_ms: float = 400.0  # Time to first token
+    tokens_per_second: float = 80.0  # Output token rate after the first token
+    output_tokens: int = 300  # Capped by the request's max_tokens
+    error_rate: float = 0.0  # Fraction of requests that fail
+    error_status: int = 529  # 429, 500 or 529
+    seed: int = 7
+
+ERROR_TYPES = {
+    429: "rate_limit_error",
+    500: "api_error",
+    529: "overloaded_error"
+}
+
+WORDS = (
+    "revenue cost margin variance budget overhead allocation depreciation "
+    "accrual ledger equity liability asset cash flow capital return"
+).split()
+
+def create_app(config: MockConfig) -> FastAPI:
+    """Build the mock Messages API app"""
+    app = FastAPI(title="Mock Anthropic API")
+    rng = random.Random(config.seed)
+    stats = {"requests": 0, "streams": 0, "errors": 0, "output_tokens": 0}
+
+    def error_response() -> JSONResponse:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=config.error_status,
+            content={
+                "type": "error",
+                "error": {"type": ERROR_TYPES.get(config.error_status, "api_error"), "message": "Injected failure"}
+            }
+        )
+
+    def count_input_tokens(body: dict) -> int:
+        text = str(body.get("system", "")) + "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        return max(1, len(text) // 4)
+
+    @app.get("/_stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/_reset")
+    async def reset_stats():
+        for key in stats:
+            stats[key] = 0
+        return stats
+
+    @app.post("/v1/messages")
+    async def create_message(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        if config.error_rate and rng.random() < config.error_rate:
+            return error_response()
+
+        model = body.get("model", "mock-model")
+        output_tokens = min(config.output_tokens, body.get("max_tokens", config.output_tokens))
+        input_tokens = count_input_tokens(body)
+        stats["output_tokens"] += output_tokens
+        words = [rng.choice(WORDS) for _ in range(output_tokens)]
+
+        if body.get("stream"):
+            stats["streams"] += 1
+            return StreamingResponse(
+                stream_events(model, words, input_tokens),
+                media_type="text/event-stream"
+            )
+
+        await asyncio.sleep(config.latency_ms / 1000 + output_tokens / config.tokens_per_second)
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [{"type": "text", "text": " ".join(words)}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        }
+
+    async def stream_events(model: str, words, input_tokens: int):
+        def event(name: str, data: dict) -> str:
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+        yield event("message_start", {
+            "type": "message_start",
+            "message": {
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "type": "message",
+                "role": "assistant",
+                "model": model,
+                "content": [],
+                "stop_reason": None,
+                "stop_sequence": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": 1}
+            }
+        })
+        yield event("content_block_start", {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""}
+        })
+
+        await asyncio.sleep(config.latency_ms / 1000)
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(1 / config.tokens_per_second)
+            yield event("content_block_delta", {
+                "type": "content_block_delta",
+                "index": 0,
+                "delta": {"type": "text_delta", "text": word if index == 0 else " " + word}
+            })
+
+        yield event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": len(words)}
+        })
+        yield event("message_stop", {"type": "message_stop"})
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=MockConfig.latency_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=MockConfig.tokens_per_second)
+    parser.add_argument("--output-tokens", type=int, default=MockConfig.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--error-status", type=int, default=MockConfig.error_status, choices=sorted(ERROR_TYPES))
+    parser.add_argument("--seed", type=int, default=MockConfig.seed)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed
+    )
+
+    import uvicorn
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
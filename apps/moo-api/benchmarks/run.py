@@ -0,0 +1,328 @@
+"""
+Benchmark Runner
+Drives scenario load against the API in-process and compares to a baseline
+
+    python -m benchmarks.run --database-url sqlite:///./bench.db
+                             [--scenarios chat,sidebar-poll] [--requests 2000]
+                             [--concurrency 32] [--save-baseline]
+
+Runs fully offline: the API is served through httpx's ASGI transport, and
+Claude calls go to a mock Anthropic server started as a subprocess. For each
+scenario the report records throughput, p50/p95/p99 latency, DB queries per
+request and process RSS. Without --save-baseline the report is compared
+against the stored baseline, and the exit code is non-zero on regression.
+
+Every scenario starts from the same state: it runs against a fresh
+disposable copy of the dataset (a copied SQLite file, or a Postgres database
+created from the dataset as TEMPLATE), with its request sequence reseeded and
+the sidebar cache cleared. The dataset itself is never written to, and only
+databases created by benchmarks.datagen are accepted.
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+from .datagen import is_benchmark_database
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def percentile(ordered: List[float], p: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to peak RSS off Linux"""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def start_mock_server(args) -> subprocess.Popen:
+    """Start the mock Anthropic server and wait until it answers"""
+    import httpx
+
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.mock_anthropic",
+        "--port", str(args.mock_port),
+        "--latency-ms", str(args.mock_latency_ms),
+        "--tokens-per-second", str(args.mock_tokens_per_second),
+        "--output-tokens", str(args.mock_output_tokens),
+        "--error-rate", str(args.mock_error_rate),
+    ], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{args.mock_port}/_stats", timeout=0.5)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError("Mock Anthropic server did not start")
+
+def copy_url(source_url: str, work_dir: str) -> str:
+    """URL of the disposable copy scenarios run against"""
+    source = make_url(source_url)
+    if source.get_backend_name() == "sqlite":
+        return source.set(database=os.path.join(work_dir, "scenario.db")).render_as_string(hide_password=False)
+    if source.get_backend_name() == "postgresql":
+        return source.set(database=f"{source.database}_scenario").render_as_string(hide_password=False)
+    raise SystemExit(f"Unsupported benchmark database: {source.get_backend_name()}")
+
+def _postgres_admin(url):
+    """AUTOCOMMIT connection to the maintenance database, for CREATE/DROP DATABASE"""
+    engine = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    return engine, engine.connect()
+
+def restore_copy(source_url: str, target_url: str) -> None:
+    """Replace the disposable copy with a fresh copy of the dataset"""
+    source, target = make_url(source_url), make_url(target_url)
+    if source.get_backend_name() == "sqlite":
+        for suffix in ("-journal", "-wal", "-shm"):
+            if os.path.exists(target.database + suffix):
+                os.remove(target.database + suffix)
+        shutil.copyfile(source.database, target.database)
+        return
+
+    engine, connection = _postgres_admin(source)
+    try:
+        quote = engine.dialect.identifier_preparer.quote
+        connection.execute(text(f"DROP DATABASE IF EXISTS {quote(target.database)}"))
+        connection.execute(text(f"CREATE DATABASE {quote(target.database)} TEMPLATE {quote(source.database)}"))
+    finally:
+        connection.close()
+        engine.dispose()
+
+def remove_copy(target_url: str, work_dir: str) -> None:
+    target = make_url(target_url)
+    if target.get_backend_name() == "postgresql":
+        engine, connection = _postgres_admin(target)
+        try:
+            quote = engine.dialect.identifier_preparer.quote
+            connection.execute(text(f"DROP DATABASE IF EXISTS {quote(target.database)}"))
+        finally:
+            connection.close()
+            engine.dispose()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+async def run_scenario(client, name: str, scenario, workload, requests: int, concurrency: int, query_counter: Dict) -> Dict:
+    """Send `requests` requests from the scenario mix with `concurrency` workers"""
+    weights = [weight for weight, _ in scenario]
+    builders = [builder for _, builder in scenario]
+
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            builder = workload.rng.choices(builders, weights)[0]
+            request = builder(workload)
+
+            headers = {}
+            if request.etag_key and request.etag_key in workload.etags:
+                headers["If-None-Match"] = workload.etags[request.etag_key]
+
+            started = time.perf_counter()
+            response = await client.request(
+                request.method, request.path,
+                json=request.json, params=request.params, headers=headers
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            if request.etag_key and "etag" in response.headers:
+                workload.etags[request.etag_key] = response.headers["etag"]
+
+    queries_before = query_counter["queries"]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": percentile(ordered, 0.50),
+        "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99),
+        "db_queries_per_request": round((query_counter["queries"] - queries_before) / max(len(latencies), 1), 2),
+        "rss_mb": rss_mb()
+    }
+
+def compare(report: Dict, baseline: Dict, tolerance: float, query_tolerance: float) -> List[str]:
+    """List regressions of report against baseline"""
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps")
+        for key in ("p95_ms", "p99_ms"):
+            if previous[key] and current[key] and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {previous[key]} -> {current[key]}")
+        # Query counts vary a little with cache races between concurrent misses
+        if current["db_queries_per_request"] > previous["db_queries_per_request"] * (1 + query_tolerance) + 0.05:
+            regressions.append(
+                f"{name}: db queries/request {previous['db_queries_per_request']} -> {current['db_queries_per_request']}"
+            )
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+def print_table(report: Dict) -> None:
+    print(f"{'scenario':<20}{'req':>7}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>8}{'rss':>8}")
+    for name, s in report["scenarios"].items():
+        print(
+            f"{name:<20}{s['requests']:>7}{s['errors']:>6}{s['throughput_rps']:>9}"
+            f"{s['p50_ms'] or 0:>9}{s['p95_ms'] or 0:>9}{s['p99_ms'] or 0:>9}"
+            f"{s['db_queries_per_request']:>8}{s['rss_mb']:>8}"
+        )
+
+async def run(args) -> Dict:
+    # Configure the API before it is imported - it reads the environment at import time.
+    # The app only ever sees the disposable copy, never the dataset itself.
+    work_dir = tempfile.mkdtemp(prefix="moo-bench-")
+    scenario_url = copy_url(args.database_url, work_dir)
+    restore_copy(args.database_url, scenario_url)
+    os.environ["DATABASE_URL"] = scenario_url
+    os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{args.mock_port}"
+    os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-benchmark")
+
+    import httpx
+    from sqlalchemy import event
+
+    from app.cache.sidebar import sidebar_cache
+    from app.database import SessionLocal, engine, init_db
+    from app.main import app
+    from .scenarios import SCENARIOS, Workload
+
+    query_counter = {"queries": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(*_):
+        query_counter["queries"] += 1
+
+    db = SessionLocal()
+    try:
+        workload = Workload.from_db(db, seed=args.seed)
+    finally:
+        db.close()
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    report = {
+        "meta": {
+            "database": make_url(args.database_url).render_as_string(hide_password=True),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mock_latency_ms": args.mock_latency_ms,
+            "mock_tokens_per_second": args.mock_tokens_per_second,
+            "users_sampled": len(workload.users)
+        },
+        "scenarios": {}
+    }
+
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://moo-bench", timeout=120) as client:
+            for index, name in enumerate(names):
+                if index:
+                    # Close pooled connections before the copy is replaced underneath them
+                    engine.dispose()
+                    restore_copy(args.database_url, scenario_url)
+                    init_db()
+                # Chat turns are bounded by mock latency, so send fewer of them
+                requests = max(args.requests // 10, 1) if name == "chat" else args.requests
+                workload.reset(f"{args.seed}:{name}")
+                sidebar_cache.clear()
+
+                report["scenarios"][name] = await run_scenario(
+                    client, name, SCENARIOS[name], workload, requests, args.concurrency, query_counter
+                )
+    finally:
+        engine.dispose()
+        remove_copy(scenario_url, work_dir)
+
+    report["meta"]["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    report["upstream"] = httpx.get(f"http://127.0.0.1:{args.mock_port}/_stats").json()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Moo API load and latency benchmarks offline")
+    parser.add_argument("--scenarios", help="Comma-separated scenario names (default: all)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--database-url", required=True, help="Dataset created by benchmarks.datagen (never modified)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mock-port", type=int, default=8089)
+    parser.add_argument("--mock-latency-ms", type=float, default=400)
+    parser.add_argument("--mock-tokens-per-second", type=float, default=400)
+    parser.add_argument("--mock-output-tokens", type=int, default=300)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown")
+    parser.add_argument("--query-tolerance", type=float, default=0.15, help="Allowed relative increase in DB queries/request")
+    args = parser.parse_args()
+
+    if not is_benchmark_database(args.database_url):
+        sys.exit(f"{args.database_url} was not created by benchmarks.datagen - refusing to benchmark against it")
+
+    mock = start_mock_server(args)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    print_table(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found - run with --save-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance, args.query_tolerance)
+
+    if regressions:
+        print("\nRegressions against baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+
+    print("\nNo regressions against baseline")
+
+if __name__ == "__main__":
+    main()
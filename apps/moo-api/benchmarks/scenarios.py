@@ -0,0 +1,180 @@
+"""
+Benchmark Scenarios
+Weighted request mixes for /chat, the conversations and the projects routers
+
+Each scenario is a list of (weight, builder). A builder receives the
+Workload and returns the request to send, so adding a scenario means adding
+data here - the runner does not change.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import random
+
+from sqlalchemy import func
+
+from app.database.models import Conversation, Project
+
+@dataclass
+class BenchRequest:
+    """One HTTP request for the runner to send"""
+    method: str
+    path: str
+    json: Optional[Dict] = None
+    params: Optional[Dict] = None
+    # Remember the response ETag under this key and send it back next time
+    etag_key: Optional[str] = None
+
+@dataclass
+class Workload:
+    """Ids sampled from the database plus per-run client state"""
+    users: List[str]
+    conversations: Dict[str, List[int]]
+    projects: Dict[str, List[int]]
+    rng: random.Random
+    etags: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_db(cls, db, sample_users: int = 500, seed: int = 1) -> "Workload":
+        """Sample the most active users so requests hit realistic row counts"""
+        rows = db.query(Conversation.user_id, func.count(Conversation.id)).filter(
+            Conversation.user_id.isnot(None)
+        ).group_by(Conversation.user_id).order_by(func.count(Conversation.id).desc()).limit(sample_users).all()
+        users = [user_id for user_id, _ in rows]
+
+        conversations: Dict[str, List[int]] = {user_id: [] for user_id in users}
+        for conversation_id, user_id in db.query(Conversation.id, Conversation.user_id).filter(
+            Conversation.user_id.in_(users)
+        ):
+            conversations[user_id].append(conversation_id)
+
+        projects: Dict[str, List[int]] = {user_id: [] for user_id in users}
+        for project_id, user_id in db.query(Project.id, Project.user_id).filter(Project.user_id.in_(users)):
+            projects[user_id].append(project_id)
+
+        if not users:
+            raise ValueError("No conversations found - run `python -m benchmarks.datagen` first")
+
+        return cls(users=users, conversations=conversations, projects=projects, rng=random.Random(seed))
+
+    def reset(self, seed: str) -> None:
+        """Restart the request sequence and forget ETags so a scenario replays identically"""
+        self.rng = random.Random(seed)
+        self.etags.clear()
+
+    def user(self) -> str:
+        return self.rng.choice(self.users)
+
+    def conversation(self, user_id: str) -> Optional[int]:
+        ids = self.conversations.get(user_id)
+        return self.rng.choice(ids) if ids else None
+
+    def project(self, user_id: str) -> Optional[int]:
+        ids = self.projects.get(user_id)
+        return self.rng.choice(ids) if ids else None
+
+# Suggested-question chips - identical prompts many users send at once
+CHIP_PROMPTS = [
+    "What is break-even analysis?",
+    "Explain the difference between NPV and IRR",
+    "What is activity-based costing?",
+]
+
+def list_conversations(w: Workload, revalidate: bool = False) -> BenchRequest:
+    user_id = w.user()
+    return BenchRequest(
+        "GET", "/conversations/", params={"user_id": user_id},
+        etag_key=f"conversations:{user_id}" if revalidate else None
+    )
+
+def list_projects(w: Workload, revalidate: bool = False) -> BenchRequest:
+    user_id = w.user()
+    return BenchRequest(
+        "GET", "/projects/", params={"user_id": user_id},
+        etag_key=f"projects:{user_id}" if revalidate else None
+    )
+
+def open_conversation(w: Workload, revalidate: bool = False) -> BenchRequest:
+    conversation_id = w.conversation(w.user())
+    return BenchRequest(
+        "GET", f"/conversations/{conversation_id}",
+        etag_key=f"conversation:{conversation_id}" if revalidate else None
+    )
+
+def add_message(w: Workload) -> BenchRequest:
+    conversation_id = w.conversation(w.user())
+    return BenchRequest(
+        "POST", f"/conversations/{conversation_id}/messages",
+        json={"role": "user", "content": "Follow-up: how does this change with a 10% price increase?"}
+    )
+
+def create_conversation(w: Workload) -> BenchRequest:
+    user_id = w.user()
+    return BenchRequest("POST", "/conversations/", json={
+        "user_id": user_id,
+        "project_id": w.project(user_id),
+        "mode": "learning",
+        "discipline": "all",
+        "messages": [{"role": "user", "content": "Explain contribution margin"}]
+    })
+
+def create_project(w: Workload) -> BenchRequest:
+    return BenchRequest("POST", "/projects/", json={
+        "user_id": w.user(),
+        "name": "Benchmark Project",
+        "discipline": "cost_accounting"
+    })
+
+def update_project(w: Workload) -> BenchRequest:
+    user_id = w.user()
+    project_id = w.project(user_id)
+    if project_id is None:
+        return list_projects(w)
+    return BenchRequest("PUT", f"/projects/{project_id}", params={"name": "Renamed Project"})
+
+def chat(w: Workload) -> BenchRequest:
+    if w.rng.random() < 0.3:
+        message = w.rng.choice(CHIP_PROMPTS)
+    else:
+        message = f"How should I allocate overhead across {w.rng.randint(2, 500)} product lines?"
+    return BenchRequest("POST", "/chat", json={
+        "message": message,
+        "mode": w.rng.choice(["learning", "project"]),
+        "discipline": "all",
+        "conversation_history": []
+    })
+
+def get_disciplines(w: Workload) -> BenchRequest:
+    return BenchRequest("GET", "/disciplines", etag_key="disciplines")
+
+Scenario = List[Tuple[float, Callable[[Workload], BenchRequest]]]
+
+SCENARIOS: Dict[str, Scenario] = {
+    # Clients refreshing the sidebar without conditional requests
+    "sidebar-poll": [
+        (0.6, list_conversations),
+        (0.4, list_projects),
+    ],
+    # The same polling with If-None-Match, as the frontend should do it
+    "sidebar-revalidate": [
+        (0.5, lambda w: list_conversations(w, revalidate=True)),
+        (0.3, lambda w: list_projects(w, revalidate=True)),
+        (0.2, get_disciplines),
+    ],
+    "open-conversation": [
+        (0.7, open_conversation),
+        (0.3, lambda w: open_conversation(w, revalidate=True)),
+    ],
+    # Reads interleaved with every mutating endpoint, exercising invalidation
+    "write-mix": [
+        (0.35, list_conversations),
+        (0.15, list_projects),
+        (0.25, add_message),
+        (0.10, create_conversation),
+        (0.05, create_project),
+        (0.10, update_project),
+    ],
+    "chat": [
+        (1.0, chat),
+    ],
+}
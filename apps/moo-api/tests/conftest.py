@@ -0,0 +1,69 @@
+"""
+Shared test fixtures
+
+Every test runs against a fresh SQLite database in a temporary directory and
+a fresh in-process sidebar cache. The Anthropic client is never called - tests
+that need Claude replace claude_service.client with a fake.
+"""
+
+import os
+import tempfile
+
+# Must be set before the app (and its engine) is imported
+_tmp_dir = tempfile.mkdtemp(prefix="moo-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/moo.db"
+os.environ["ANTHROPIC_API_KEY"] = "test-key"
+os.environ.pop("SIDEBAR_CACHE_URL", None)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache.sidebar import MemoryBackend, sidebar_cache
+from app.database import SessionLocal, engine
+from app.database.models import Base
+from app.main import app, claude_service
+
+from .fake_anthropic import FakeMessages, fake_client
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    """Empty tables and an empty sidebar cache for every test"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(sidebar_cache, "backend", MemoryBackend())
+    yield
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def create_conversation(client):
+    """Create a conversation through the API and return its JSON"""
+    def create(user_id="alice", project_id=None, messages=("Hello",)):
+        response = client.post("/conversations/", json={
+            "user_id": user_id,
+            "project_id": project_id,
+            "messages": [{"role": "user", "content": content} for content in messages]
+        })
+        assert response.status_code == 200
+        return response.json()
+
+    return create
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake Anthropic messages client behind the app, answering immediately"""
+    messages = FakeMessages()
+    messages.release.set()
+    monkeypatch.setattr(claude_service, "client", fake_client(messages))
+    return messages
@@ -0,0 +1,86 @@
+"""
+In-process stand-in for AsyncAnthropic().messages
+
+Buffered calls block until `release` is set; streams yield whatever the test
+puts on `feed` (None ends the stream, an exception is raised mid-stream).
+Both record the models called; models in `failures` raise that error.
+"""
+
+from types import SimpleNamespace
+from typing import Dict, List
+import asyncio
+
+import httpx
+
+class FakeStream:
+    def __init__(self, messages: "FakeMessages"):
+        self.messages = messages
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.messages.closed_streams += 1
+        return False
+
+    @property
+    def text_stream(self):
+        return self._text()
+
+    async def _text(self):
+        while True:
+            chunk = await self.messages.feed.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    async def get_final_message(self):
+        return SimpleNamespace(
+            usage=SimpleNamespace(input_tokens=self.messages.input_tokens, output_tokens=self.messages.output_tokens),
+            stop_reason="end_turn"
+        )
+
+class FakeMessages:
+    """Create inside a running event loop"""
+
+    def __init__(self, text: str = "Net present value discounts future cash flows.",
+                 input_tokens: int = 120, output_tokens: int = 40):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.release = asyncio.Event()
+        self.feed: asyncio.Queue = asyncio.Queue()
+        self.failures: Dict[str, Exception] = {}
+        self.models_called: List[str] = []
+        self.create_calls = 0
+        self.stream_calls = 0
+        self.closed_streams = 0
+
+    async def create(self, model, max_tokens, system, messages):
+        self.create_calls += 1
+        self.models_called.append(model)
+        await self.release.wait()
+        if model in self.failures:
+            raise self.failures[model]
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=self.text)],
+            usage=SimpleNamespace(input_tokens=self.input_tokens, output_tokens=self.output_tokens),
+            stop_reason="end_turn"
+        )
+
+    def stream(self, model, max_tokens, system, messages):
+        self.stream_calls += 1
+        self.models_called.append(model)
+        if model in self.failures:
+            raise self.failures[model]
+        return FakeStream(self)
+
+def fake_client(messages: FakeMessages) -> SimpleNamespace:
+    return SimpleNamespace(messages=messages)
+
+def api_error(error_class, status: int, message: str = "Upstream error"):
+    """Build an anthropic.APIStatusError subclass as the SDK raises it"""
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    return error_class(message, response=httpx.Response(status, request=request), body=None)
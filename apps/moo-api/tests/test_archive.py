@@ -0,0 +1,81 @@
+"""
+Message archiving
+
+Archiving must never drop a message: conversations written after the batch
+was selected are skipped, and archived ones are promoted back on write.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.database import engine
+from app.database.archive import archive_conversation, archive_idle_conversations, load_messages
+from app.database.models import Conversation, ConversationArchive, Message
+from app.routers.conversations import _load_conversation_list
+
+
+def make_idle(db, conversation_id, days=120):
+    db.query(Conversation).filter(Conversation.id == conversation_id).update(
+        {Conversation.updated_at: datetime.utcnow() - timedelta(days=days)},
+        synchronize_session=False
+    )
+    db.commit()
+
+def test_idle_conversation_is_archived_and_read_back(client, db, create_conversation):
+    conversation = create_conversation(messages=("What is NPV?", "And IRR?"))
+    make_idle(db, conversation["id"])
+
+    stats = archive_idle_conversations(db, idle_days=90)
+
+    assert stats["conversations"] == 1
+    assert db.query(Message).count() == 0
+    detail = client.get(f"/conversations/{conversation['id']}").json()
+    assert [message["content"] for message in detail["messages"]] == ["What is NPV?", "And IRR?"]
+
+def test_conversation_written_after_selection_is_not_archived(client, db, create_conversation):
+    conversation = create_conversation()
+    make_idle(db, conversation["id"])
+    cutoff = datetime.utcnow() - timedelta(days=90)
+    selected = db.query(Conversation).filter(Conversation.updated_at < cutoff).one()
+
+    # A message lands between the batch query and archiving
+    client.post(f"/conversations/{conversation['id']}/messages", json={"role": "assistant", "content": "Late"})
+
+    assert archive_conversation(db, selected, cutoff) is None
+    db.commit()
+    assert db.query(ConversationArchive).count() == 0
+    assert db.query(Message).filter(Message.conversation_id == conversation["id"]).count() == 2
+
+def test_message_added_to_archived_conversation_promotes_it(client, db, create_conversation):
+    conversation = create_conversation(messages=("First",))
+    make_idle(db, conversation["id"])
+    archive_idle_conversations(db, idle_days=90)
+
+    response = client.post(f"/conversations/{conversation['id']}/messages", json={"role": "assistant", "content": "Second"})
+    assert response.status_code == 200
+
+    db.expire_all()
+    assert db.query(ConversationArchive).count() == 0
+    conversation_row = db.get(Conversation, conversation["id"])
+    assert [message["content"] for message in load_messages(db, conversation_row)] == ["First", "Second"]
+
+def test_listing_counts_hot_and_archived_messages_without_per_row_queries(client, db, create_conversation):
+    archived = create_conversation(messages=("What is NPV?", "And IRR?"))
+    make_idle(db, archived["id"])
+    archive_idle_conversations(db, idle_days=90)
+    hot = create_conversation(messages=("One", "Two", "Three"))
+    empty = create_conversation(messages=())
+
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        listing = _load_conversation_list(db, "alice", 0, 50)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    counts = {item["id"]: item["message_count"] for item in listing["items"]}
+    assert counts == {archived["id"]: 2, hot["id"]: 3, empty["id"]: 0}
+    # The ETag aggregates and the page itself, however many rows it has
+    assert len(statements) == 2
@@ -0,0 +1,47 @@
+"""
+Schema upgrades
+
+add_missing_columns runs at import in every worker, so it has to add columns
+to old tables and survive another worker adding them first.
+"""
+
+from sqlalchemy import inspect, text
+
+import app.database as database
+from app.database import add_missing_columns, engine
+
+USAGE_COLUMNS = ["model", "input_tokens", "output_tokens", "stop_reason", "latency_ms", "coalesced"]
+
+def message_columns():
+    return {column["name"] for column in inspect(engine).get_columns("messages")}
+
+def test_adds_columns_missing_from_an_old_table():
+    with engine.begin() as connection:
+        for name in USAGE_COLUMNS:
+            connection.execute(text(f"ALTER TABLE messages DROP COLUMN {name}"))
+    assert not message_columns() & set(USAGE_COLUMNS)
+
+    add_missing_columns()
+
+    assert set(USAGE_COLUMNS) <= message_columns()
+
+def test_columns_added_by_another_worker_are_skipped(monkeypatch):
+    class StaleInspector:
+        """Inspected before a racing worker added the usage columns"""
+        def __init__(self, bind):
+            self.inspector = inspect(bind)
+
+        def has_table(self, name):
+            return self.inspector.has_table(name)
+
+        def get_columns(self, name):
+            columns = self.inspector.get_columns(name)
+            if name == "messages":
+                columns = [column for column in columns if column["name"] not in USAGE_COLUMNS]
+            return columns
+
+    monkeypatch.setattr(database, "inspect", StaleInspector)
+
+    add_missing_columns()
+
+    assert set(USAGE_COLUMNS) <= message_columns()
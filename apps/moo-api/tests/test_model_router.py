@@ -0,0 +1,168 @@
+"""
+Model routing
+
+Rule matching, escalation along fallbacks, and the offline replay of
+stored history against a rule set.
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+
+import anthropic
+import pytest
+
+from app.database.archive import archive_idle_conversations
+from app.database.models import Conversation
+from app.services import ClaudeService
+from app.services.model_router import DEEP_MODEL, FAST_MODEL, ModelRouter, classify_complexity
+from app.services.routing_eval import evaluate
+
+from .fake_anthropic import FakeMessages, api_error, fake_client
+
+def route(router, message, mode="learning", history=0):
+    messages = [
+        {"role": "user" if index % 2 == 0 else "assistant", "content": "Earlier turn"}
+        for index in range(history)
+    ] + [{"role": "user", "content": message}]
+    return router.route(message, "all", mode, messages)
+
+@pytest.mark.parametrize("message", [
+    "What is NPV?",
+    "What is IRR?",
+    "Define variance",
+    "What is break-even?",
+    "Explain the difference between NPV and IRR",
+])
+def test_short_definitional_questions_are_simple(message):
+    assert classify_complexity(message) == "simple"
+
+@pytest.mark.parametrize("message", [
+    "How do I calculate NPV for a five-year project with uneven cash flows?",
+    "What is the NPV of 100, 200 and 300 at 10%?",
+    "Compare IRR and NPV when ranking mutually exclusive projects",
+])
+def test_task_questions_are_complex(message):
+    assert classify_complexity(message) == "complex"
+
+def test_quick_learning_question_goes_to_fast_model():
+    decision = route(ModelRouter(), "What is NPV?")
+
+    assert decision.model == FAST_MODEL
+    assert decision.rule == "learning-quick-question"
+    assert decision.models == [FAST_MODEL, DEEP_MODEL]
+
+def test_rule_matches_on_mode_history_and_length():
+    router = ModelRouter()
+
+    assert route(router, "What is NPV?", mode="project").model == DEEP_MODEL
+    assert route(router, "What is NPV?", history=4).model == FAST_MODEL
+    assert route(router, "What is NPV?", history=6).model == DEEP_MODEL
+    assert route(router, "What is NPV? " + "Please keep it short. " * 20).model == DEEP_MODEL
+
+def test_escalation_chain_skips_models_the_input_does_not_fit():
+    router = ModelRouter({
+        "default_model": FAST_MODEL,
+        "models": {
+            FAST_MODEL: {"max_input_tokens": 100, "fallback": DEEP_MODEL},
+            DEEP_MODEL: {"max_input_tokens": 1000, "fallback": None}
+        },
+        "rules": []
+    })
+
+    assert router._escalation_chain(FAST_MODEL, 50) == [FAST_MODEL, DEEP_MODEL]
+    assert router._escalation_chain(FAST_MODEL, 500) == [DEEP_MODEL]
+    # Too long for every model - the last one is still tried
+    assert router._escalation_chain(FAST_MODEL, 5000) == [DEEP_MODEL]
+
+@pytest.mark.parametrize("error, escalate", [
+    (api_error(anthropic.RateLimitError, 429), True),
+    (api_error(anthropic.InternalServerError, 529, "Overloaded"), True),
+    (api_error(anthropic.BadRequestError, 400, "prompt is too long: 210000 tokens"), True),
+    (api_error(anthropic.BadRequestError, 400, "messages: roles must alternate"), False),
+    (api_error(anthropic.AuthenticationError, 401), False),
+])
+def test_should_escalate(error, escalate):
+    assert ModelRouter.should_escalate(error) is escalate
+
+def make_service():
+    """ClaudeService wired to a fake upstream (call inside the event loop)"""
+    service = ClaudeService()
+    upstream = FakeMessages()
+    upstream.release.set()
+    service.client = fake_client(upstream)
+    return service, upstream
+
+def test_create_escalates_to_fallback_on_retryable_error():
+    async def scenario():
+        service, upstream = make_service()
+        upstream.failures[FAST_MODEL] = api_error(anthropic.RateLimitError, 429)
+        return service, upstream, await service.chat("What is NPV?")
+
+    service, upstream, result = asyncio.run(scenario())
+
+    assert upstream.models_called == [FAST_MODEL, DEEP_MODEL]
+    assert result["model"] == DEEP_MODEL
+    assert service.router.stats()[FAST_MODEL]["escalations"] == 1
+
+def test_create_does_not_escalate_on_other_client_errors():
+    async def scenario():
+        service, upstream = make_service()
+        upstream.failures[FAST_MODEL] = api_error(anthropic.BadRequestError, 400, "roles must alternate")
+        with pytest.raises(Exception, match="roles must alternate"):
+            await service.chat("What is NPV?")
+        return upstream
+
+    assert asyncio.run(scenario()).models_called == [FAST_MODEL]
+
+def test_stream_escalates_before_first_chunk():
+    async def scenario():
+        service, upstream = make_service()
+        upstream.failures[FAST_MODEL] = api_error(anthropic.InternalServerError, 529, "Overloaded")
+        upstream.feed.put_nowait("Net present value")
+        upstream.feed.put_nowait(None)
+        return upstream, [event async for event in service.chat_stream("What is NPV?")]
+
+    upstream, events = asyncio.run(scenario())
+
+    assert upstream.models_called == [FAST_MODEL, DEEP_MODEL]
+    assert events[-1]["model"] == DEEP_MODEL
+
+def test_stream_does_not_escalate_after_first_chunk():
+    async def scenario():
+        service, upstream = make_service()
+        upstream.feed.put_nowait("Net present ")
+        upstream.feed.put_nowait(api_error(anthropic.InternalServerError, 529, "Overloaded"))
+        events = []
+        with pytest.raises(Exception, match="Overloaded"):
+            async for event in service.chat_stream("What is NPV?"):
+                events.append(event)
+        return upstream, events
+
+    upstream, events = asyncio.run(scenario())
+
+    assert upstream.models_called == [FAST_MODEL]
+    assert events == [{"type": "text", "text": "Net present "}]
+
+def test_routing_eval_replays_hot_and_archived_history(client, db, create_conversation):
+    quick = create_conversation(messages=("What is NPV?",))
+    client.post(f"/conversations/{quick['id']}/messages", json={"role": "assistant", "content": "Net present value"})
+    create_conversation(messages=("How do I calculate NPV for a five-year project with uneven cash flows?",))
+
+    # The quick question moves to the cold tier
+    db.query(Conversation).filter(Conversation.id == quick["id"]).update(
+        {Conversation.updated_at: datetime.utcnow() - timedelta(days=120)},
+        synchronize_session=False
+    )
+    db.commit()
+    assert archive_idle_conversations(db, idle_days=90)["conversations"] == 1
+
+    everything_deep = ModelRouter({"default_model": DEEP_MODEL, "models": {}, "rules": []})
+    report = evaluate(ModelRouter(), baseline=everything_deep)
+
+    assert report["turns"] == 2
+    assert report["models"][FAST_MODEL]["turns"] == 1
+    assert report["models"][FAST_MODEL]["avg_reply_chars"] == len("Net present value")
+    assert report["models"][DEEP_MODEL]["turns"] == 1
+    assert report["rules"] == {"learning-quick-question": 1, "default": 1}
+    assert report["changed_decisions"] == 1
+    assert report["changed_examples"][0]["conversation_id"] == quick["id"]
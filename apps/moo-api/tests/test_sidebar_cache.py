@@ -0,0 +1,223 @@
+"""
+Sidebar cache consistency
+
+Interleaves every mutating endpoint with the cached listings and checks
+that no listing or ETag from before a write is ever served after it.
+"""
+
+from app.database import SessionLocal
+from app.routers import conversations, projects
+
+USER = "alice"
+OTHER_USER = "bob"
+
+def create_project(client, name="Budget", user_id=USER):
+    response = client.post("/projects/", json={"name": name, "user_id": user_id})
+    assert response.status_code == 200
+    return response.json()
+
+def list_conversations(client, user_id=USER, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/conversations/", params={"user_id": user_id}, headers=headers)
+
+def list_projects(client, user_id=USER, etag=None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/projects/", params={"user_id": user_id}, headers=headers)
+
+def revalidate(list_view, client, stale_etag, user_id=USER):
+    """Re-request a listing with the pre-write ETag - it must not be 304"""
+    response = list_view(client, user_id=user_id, etag=stale_etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != stale_etag
+    return response.json()
+
+def assert_matches_database(client, user_id=USER):
+    """Cached listings must equal what an uncached query returns right now"""
+    db = SessionLocal()
+    try:
+        expected_conversations = conversations._load_conversation_list(db, user_id, 0, 50)
+        expected_projects = projects._load_project_list(db, user_id)
+    finally:
+        db.close()
+
+    served = list_conversations(client, user_id=user_id)
+    assert served.headers["ETag"] == expected_conversations["etag"]
+    assert served.json() == expected_conversations["items"]
+
+    served = list_projects(client, user_id=user_id)
+    assert served.headers["ETag"] == expected_projects["etag"]
+    assert served.json() == expected_projects["items"]
+
+def test_unchanged_listing_is_served_from_cache_and_revalidates(client, create_conversation):
+    create_conversation()
+
+    first = list_conversations(client)
+    second = list_conversations(client, etag=first.headers["ETag"])
+
+    assert second.status_code == 304
+    assert client.get("/health").json()["sidebar_cache"]["hits"] >= 1
+
+def test_create_conversation_invalidates_listing(client, create_conversation):
+    create_conversation()
+    stale = list_conversations(client)
+
+    created = create_conversation(messages=("Second",))
+
+    listing = revalidate(list_conversations, client, stale.headers["ETag"])
+    assert created["id"] in [conversation["id"] for conversation in listing]
+
+def test_add_message_invalidates_listing(client, create_conversation):
+    conversation = create_conversation()
+    stale = list_conversations(client)
+
+    client.post(f"/conversations/{conversation['id']}/messages", json={"role": "assistant", "content": "Hi"})
+
+    listing = revalidate(list_conversations, client, stale.headers["ETag"])
+    assert listing[0]["message_count"] == 2
+
+def test_save_chat_turn_invalidates_listing(client, db, create_conversation):
+    conversation = create_conversation()
+    stale = list_conversations(client)
+
+    conversations.save_chat_turn(db, conversation["id"], [
+        conversations.MessageCreate(role="user", content="What is NPV?"),
+        conversations.MessageCreate(role="assistant", content="Net present value")
+    ])
+
+    listing = revalidate(list_conversations, client, stale.headers["ETag"])
+    assert listing[0]["message_count"] == 3
+
+def test_delete_conversation_invalidates_listing(client, create_conversation):
+    kept = create_conversation()
+    deleted = create_conversation()
+    stale = list_conversations(client)
+
+    client.delete(f"/conversations/{deleted['id']}")
+
+    listing = revalidate(list_conversations, client, stale.headers["ETag"])
+    assert [conversation["id"] for conversation in listing] == [kept["id"]]
+
+def test_create_project_invalidates_listing(client):
+    stale = list_projects(client)
+
+    project = create_project(client)
+
+    listing = revalidate(list_projects, client, stale.headers["ETag"])
+    assert [item["id"] for item in listing] == [project["id"]]
+
+def test_update_project_invalidates_listing(client):
+    project = create_project(client)
+    stale = list_projects(client)
+
+    client.put(f"/projects/{project['id']}", params={"name": "Renamed"})
+
+    listing = revalidate(list_projects, client, stale.headers["ETag"])
+    assert listing[0]["name"] == "Renamed"
+
+def test_conversation_writes_invalidate_project_counts(client, create_conversation):
+    project = create_project(client)
+    stale = list_projects(client)
+
+    conversation = create_conversation(project_id=project["id"])
+
+    listing = revalidate(list_projects, client, stale.headers["ETag"])
+    assert listing[0]["conversation_count"] == 1
+
+    stale = list_projects(client)
+    client.delete(f"/conversations/{conversation['id']}")
+
+    listing = revalidate(list_projects, client, stale.headers["ETag"])
+    assert listing[0]["conversation_count"] == 0
+
+def test_delete_project_invalidates_conversation_owners(client, create_conversation):
+    project = create_project(client)
+    # Another user's conversation filed in alice's project is deleted with it
+    create_conversation(user_id=OTHER_USER, project_id=project["id"])
+    stale_projects = list_projects(client)
+    stale_conversations = list_conversations(client, user_id=OTHER_USER)
+
+    client.delete(f"/projects/{project['id']}")
+
+    assert revalidate(list_projects, client, stale_projects.headers["ETag"]) == []
+    assert revalidate(list_conversations, client, stale_conversations.headers["ETag"], user_id=OTHER_USER) == []
+
+def test_writes_for_one_user_keep_other_users_cached(client, create_conversation):
+    create_conversation(user_id=OTHER_USER)
+    cached = list_conversations(client, user_id=OTHER_USER)
+
+    create_conversation()
+
+    again = list_conversations(client, user_id=OTHER_USER, etag=cached.headers["ETag"])
+    assert again.status_code == 304
+
+def test_read_racing_a_conversation_write_is_not_served_later(client, monkeypatch, create_conversation):
+    conversation = create_conversation()
+    real_loader = conversations._load_conversation_list
+
+    def loader_racing_a_write(db, user_id, skip, limit):
+        listing = real_loader(db, user_id, skip, limit)
+        # The write commits and invalidates after the read queried but before it stores
+        write_db = SessionLocal()
+        try:
+            conversations.add_message(
+                conversation["id"],
+                conversations.MessageCreate(role="assistant", content="Raced"),
+                db=write_db
+            )
+        finally:
+            write_db.close()
+        return listing
+
+    monkeypatch.setattr(conversations, "_load_conversation_list", loader_racing_a_write)
+    raced = list_conversations(client)
+    monkeypatch.setattr(conversations, "_load_conversation_list", real_loader)
+
+    assert raced.json()[0]["message_count"] == 1  # The racing read's own snapshot
+    listing = revalidate(list_conversations, client, raced.headers["ETag"])
+    assert listing[0]["message_count"] == 2
+    assert_matches_database(client)
+
+def test_read_racing_a_project_write_is_not_served_later(client, monkeypatch):
+    project = create_project(client)
+    real_loader = projects._load_project_list
+
+    def loader_racing_a_write(db, user_id):
+        listing = real_loader(db, user_id)
+        write_db = SessionLocal()
+        try:
+            projects.update_project(project["id"], name="Renamed", description=None, db=write_db)
+        finally:
+            write_db.close()
+        return listing
+
+    monkeypatch.setattr(projects, "_load_project_list", loader_racing_a_write)
+    raced = list_projects(client)
+    monkeypatch.setattr(projects, "_load_project_list", real_loader)
+
+    assert raced.json()[0]["name"] == "Budget"
+    listing = revalidate(list_projects, client, raced.headers["ETag"])
+    assert listing[0]["name"] == "Renamed"
+    assert_matches_database(client)
+
+def test_interleaved_writes_never_serve_stale_listings(client, create_conversation):
+    """Run a mixed write sequence, checking both listings after every step"""
+    project = create_project(client)
+    conversation_ids = []
+
+    steps = [
+        lambda: conversation_ids.append(create_conversation()["id"]),
+        lambda: conversation_ids.append(create_conversation(project_id=project["id"])["id"]),
+        lambda: client.post(f"/conversations/{conversation_ids[0]}/messages", json={"role": "assistant", "content": "A"}),
+        lambda: client.put(f"/projects/{project['id']}", params={"description": "Q3 review"}),
+        lambda: conversation_ids.append(create_conversation(messages=("Third", "Reply"))["id"]),
+        lambda: client.post(f"/conversations/{conversation_ids[1]}/messages", json={"role": "user", "content": "B"}),
+        lambda: client.delete(f"/conversations/{conversation_ids.pop(0)}"),
+        lambda: create_project(client, name="Second"),
+        lambda: client.post(f"/conversations/{conversation_ids[-1]}/messages", json={"role": "user", "content": "C"}),
+        lambda: client.delete(f"/projects/{project['id']}"),
+    ]
+
+    assert_matches_database(client)
+    for step in steps:
+        step()
+        assert_matches_database(client)
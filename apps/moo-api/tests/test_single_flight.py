@@ -0,0 +1,100 @@
+"""
+Request coalescing
+
+Identical concurrent Claude requests must share one upstream call, and a
+late subscriber to a shared stream must get the streamed prefix first.
+"""
+
+import asyncio
+
+from app.services import ClaudeService
+
+from .fake_anthropic import FakeMessages, fake_client
+
+def make_service():
+    """ClaudeService wired to a fake upstream (call inside the event loop)"""
+    service = ClaudeService()
+    upstream = FakeMessages()
+    service.client = fake_client(upstream)
+    return service, upstream
+
+def test_identical_concurrent_requests_make_one_upstream_call():
+    async def scenario():
+        service, upstream = make_service()
+        calls = [asyncio.create_task(service.chat("What is NPV?")) for _ in range(100)]
+        await asyncio.sleep(0)  # Every caller joins while the first is in flight
+        upstream.release.set()
+        return service, upstream, await asyncio.gather(*calls)
+
+    service, upstream, results = asyncio.run(scenario())
+
+    assert upstream.create_calls == 1
+    stats = service.single_flight.stats()
+    assert stats["upstream_calls"] == 1
+    assert stats["coalesced_calls"] == 99
+    assert stats["in_flight"] == 0
+    assert {result["response"] for result in results} == {upstream.text}
+    assert sum(not result["coalesced"] for result in results) == 1
+
+def test_different_requests_are_not_coalesced():
+    async def scenario():
+        service, upstream = make_service()
+        calls = [asyncio.create_task(service.chat(f"Question {i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        await asyncio.gather(*calls)
+        return upstream
+
+    assert asyncio.run(scenario()).create_calls == 3
+
+def test_late_stream_subscriber_gets_prefix_then_follows_live():
+    async def scenario():
+        service, upstream = make_service()
+        leader = service.chat_stream("Explain IRR")
+        upstream.feed.put_nowait("Internal ")
+        upstream.feed.put_nowait("rate ")
+        leader_events = [await leader.__anext__(), await leader.__anext__()]
+
+        # Joins after two chunks were streamed
+        late = service.chat_stream("Explain IRR")
+        late_events = [await late.__anext__(), await late.__anext__()]
+
+        upstream.feed.put_nowait("of return")
+        upstream.feed.put_nowait(None)
+        leader_events += [event async for event in leader]
+        late_events += [event async for event in late]
+        return service, upstream, leader_events, late_events
+
+    service, upstream, leader_events, late_events = asyncio.run(scenario())
+
+    assert upstream.stream_calls == 1
+    assert service.single_flight.stats()["coalesced_streams"] == 1
+    texts = [event["text"] for event in late_events if event["type"] == "text"]
+    assert texts == ["Internal ", "rate ", "of return"]
+    assert late_events[:-1] == leader_events[:-1]
+    # Only the subscriber that started the upstream stream owns its usage
+    assert leader_events[-1]["coalesced"] is False
+    assert late_events[-1]["coalesced"] is True
+
+def test_last_subscriber_leaving_cancels_upstream_stream():
+    async def scenario():
+        service, upstream = make_service()
+        first = service.chat_stream("Explain WACC")
+        second = service.chat_stream("Explain WACC")
+        upstream.feed.put_nowait("Weighted ")
+        await first.__anext__()
+        await second.__anext__()
+
+        await first.aclose()
+        await asyncio.sleep(0)
+        still_open = upstream.closed_streams == 0
+
+        await second.aclose()
+        await asyncio.sleep(0)
+        return service, upstream, still_open
+
+    service, upstream, still_open = asyncio.run(scenario())
+
+    assert still_open  # One subscriber left keeps the upstream alive
+    assert upstream.closed_streams == 1
+    assert service.single_flight.stats()["cancelled_streams"] == 1
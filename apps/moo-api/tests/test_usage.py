@@ -0,0 +1,61 @@
+"""
+Token usage
+
+/chat saves turns with their usage, and the rollups must match what was
+actually spent upstream.
+"""
+
+import asyncio
+
+import httpx
+
+from app.main import app, claude_service
+
+from .fake_anthropic import FakeMessages, fake_client
+
+def test_chat_saves_turn_and_usage(client, upstream, create_conversation):
+    conversation = create_conversation(messages=())
+
+    response = client.post("/chat", json={"message": "What is NPV?", "conversation_id": conversation["id"]})
+
+    assert response.status_code == 200
+    detail = client.get(f"/conversations/{conversation['id']}").json()
+    assert [message["role"] for message in detail["messages"]] == ["user", "assistant"]
+    totals = client.get("/usage").json()["totals"]
+    assert totals["requests"] == 1
+    assert totals["input_tokens"] == upstream.input_tokens
+    assert totals["output_tokens"] == upstream.output_tokens
+
+def test_chat_with_unknown_conversation_fails_before_calling_claude(client, upstream):
+    response = client.post("/chat", json={"message": "What is NPV?", "conversation_id": 999})
+
+    assert response.status_code == 404
+    assert upstream.create_calls == 0
+
+def test_coalesced_chats_record_upstream_tokens_once(client, monkeypatch, create_conversation):
+    conversation_ids = [create_conversation(messages=())["id"] for _ in range(5)]
+
+    coalesced_before = claude_service.single_flight.coalesced_calls
+
+    async def scenario():
+        upstream = FakeMessages()
+        monkeypatch.setattr(claude_service, "client", fake_client(upstream))
+        async with httpx.AsyncClient(app=app, base_url="http://moo-test") as http:
+            calls = [
+                asyncio.create_task(http.post("/chat", json={"message": "What is NPV?", "conversation_id": conversation_id}))
+                for conversation_id in conversation_ids
+            ]
+            # Release the upstream only once every other request has joined it
+            while claude_service.single_flight.coalesced_calls < coalesced_before + len(calls) - 1:
+                await asyncio.sleep(0.01)
+            upstream.release.set()
+            return upstream, [response.json() for response in await asyncio.gather(*calls)]
+
+    upstream, responses = asyncio.run(scenario())
+
+    assert upstream.create_calls == 1
+    assert sorted(response["coalesced"] for response in responses) == [False] + [True] * 4
+    totals = client.get("/usage").json()["totals"]
+    assert totals["requests"] == 5
+    assert totals["input_tokens"] == upstream.input_tokens
+    assert totals["output_tokens"] == upstream.output_tokens
@@ -0,0 +1,133 @@
+"""
+WebSocket chat
+
+A finished turn must be saved before "done" is sent, and a disconnect or
+cancel arriving while it is saved must not lose it.
+"""
+
+import threading
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.database.models import Message
+from app.routers import conversations
+from app.services.chat_session import connection_limiter
+
+
+def chat_message(conversation_id, stream_id="s1"):
+    return {"type": "chat", "stream_id": stream_id, "message": "What is NPV?", "conversation_id": conversation_id}
+
+def receive_until(websocket, *types):
+    """Collect events up to and including the first of the given types"""
+    events = []
+    while True:
+        event = websocket.receive_json()
+        events.append(event)
+        if event["type"] in types:
+            return events
+
+def slow_save(monkeypatch, seconds=0.3):
+    """Make save_chat_turn slow; the returned event is set once it has started"""
+    started = threading.Event()
+    real_save = conversations.save_chat_turn
+
+    def save(*args):
+        started.set()
+        time.sleep(seconds)
+        return real_save(*args)
+
+    monkeypatch.setattr(conversations, "save_chat_turn", save)
+    return started
+
+def wait_for_handlers(timeout=5.0):
+    """TestClient returns before the app's handler does - wait for it to release its slot"""
+    deadline = time.monotonic() + timeout
+    while connection_limiter.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert connection_limiter.active == 0
+
+def saved_contents(db, conversation_id):
+    return [message.content for message in db.query(Message).filter(Message.conversation_id == conversation_id)]
+
+def test_turn_is_saved_before_done(client, db, upstream, create_conversation):
+    conversation = create_conversation(messages=())
+    upstream.feed.put_nowait("Net present ")
+    upstream.feed.put_nowait("value")
+    upstream.feed.put_nowait(None)
+
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(chat_message(conversation["id"]))
+        events = receive_until(websocket, "done", "error")
+        # Checked while the socket is still open
+        assert saved_contents(db, conversation["id"]) == ["What is NPV?", "Net present value"]
+
+    assert events[-1]["type"] == "done"
+
+def test_disconnect_while_saving_keeps_the_turn(client, db, upstream, monkeypatch, create_conversation):
+    conversation = create_conversation(messages=())
+    started = slow_save(monkeypatch)
+    upstream.feed.put_nowait("Net present value")
+    upstream.feed.put_nowait(None)
+
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(chat_message(conversation["id"]))
+        receive_until(websocket, "text")
+        assert started.wait(5)
+    # Leaving the block closes the socket mid-save
+    wait_for_handlers()
+
+    assert saved_contents(db, conversation["id"]) == ["What is NPV?", "Net present value"]
+
+def test_cancel_while_saving_still_completes(client, db, upstream, monkeypatch, create_conversation):
+    conversation = create_conversation(messages=())
+    started = slow_save(monkeypatch)
+    upstream.feed.put_nowait("Net present value")
+    upstream.feed.put_nowait(None)
+
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(chat_message(conversation["id"]))
+        receive_until(websocket, "text")
+        assert started.wait(5)
+        websocket.send_json({"type": "cancel", "stream_id": "s1"})
+        events = receive_until(websocket, "done", "cancelled", "error")
+
+    assert events[-1]["type"] == "done"
+    assert saved_contents(db, conversation["id"]) == ["What is NPV?", "Net present value"]
+
+def test_unknown_conversation_is_rejected_before_streaming(client, upstream):
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(chat_message(999))
+        event = websocket.receive_json()
+
+    assert event == {"type": "error", "stream_id": "s1", "detail": "Conversation not found"}
+    assert upstream.stream_calls == 0
+
+def test_conversation_deleted_mid_stream_reports_error(client, upstream, monkeypatch, create_conversation):
+    conversation = create_conversation(messages=())
+    upstream.feed.put_nowait("Net present value")
+    upstream.feed.put_nowait(None)
+    # The conversation is gone by the time the turn is saved
+    monkeypatch.setattr(conversations, "save_chat_turn", lambda *args: None)
+
+    with client.websocket_connect("/ws/chat") as websocket:
+        websocket.send_json(chat_message(conversation["id"]))
+        events = receive_until(websocket, "done", "error")
+
+    assert events[-1] == {"type": "error", "stream_id": "s1", "detail": "Conversation not found"}
+
+def test_connections_over_the_limit_are_closed_with_try_again_later(client, upstream, monkeypatch):
+    monkeypatch.setattr(connection_limiter, "limit", 1)
+    rejected_before = connection_limiter.rejected
+
+    with client.websocket_connect("/ws/chat") as first:
+        with client.websocket_connect("/ws/chat") as second:
+            with pytest.raises(WebSocketDisconnect) as closed:
+                second.receive_json()
+        assert closed.value.code == 1013
+        assert connection_limiter.rejected == rejected_before + 1
+
+        # The accepted connection is unaffected
+        first.send_json({"type": "cancel", "stream_id": "s1"})
+    wait_for_handlers()